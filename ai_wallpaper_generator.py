@@ -1,8 +1,12 @@
-# ai_wallpaper_generator.py
-# PyQt6 GUI for local text->image wallpapers via DirectML (diffusers + torch-directml).
-# Run: python ai_wallpaper_generator.py
+# ai_wallpaper_generator.py
+# PyQt6 GUI for local text->image wallpapers via DirectML (diffusers + torch-directml).
+# Run: python ai_wallpaper_generator.py
 # pip install PyQt6
-import os, sys, threading, subprocess, time
+# optional: pip install optimum-quanto  (for "Quantize (low VRAM)")
+# optional: pip install optimum[onnxruntime] onnxruntime-directml  (for "Export ONNX (DirectML)")
+import os, sys, threading, subprocess, time, gc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from dataclasses import dataclass
 from PyQt6 import QtCore, QtGui, QtWidgets
@@ -10,6 +14,116 @@ from PyQt6 import QtCore, QtGui, QtWidgets
 # lazy imports inside worker so the app opens even before deps are installed
 DML_OK = None
 
+# one loaded pipeline per (realpath(model_dir), adapter), stored as (settings, pipe) with
+# settings = (dtype, W, H, quantize); reused across generations. DirectML is much faster when
+# shapes never change, so each pipe is warmed on its resolution. Changing the settings replaces
+# the pipe instead of keeping another multi-GB copy resident in VRAM.
+_PIPE_CACHE = {}
+# one lock per slot so adapters load in parallel; it is also held for the whole pipe call
+# (diffusers schedulers aren't thread-safe) and _PIPE_LOCK only guards creating them
+_PIPE_LOCKS = {}
+_PIPE_LOCK = threading.Lock()
+# PNG encoding runs here so the GPU thread can move on; level 1 is ~5× faster than the default 6
+_SAVER = ThreadPoolExecutor(max_workers=2, thread_name_prefix="png-save")
+PNG_COMPRESS_LEVEL = 1
+# prompts per pipe call for the time-of-day set; DML regresses on big fp16 batches, drop to 2 if VRAM-bound
+SET_BATCH = 4
+# longest side of the preview thumbnail built on the worker thread
+PREVIEW_MAX = 1024
+
+def _tune_pipe(pipe):
+    # 4K output is ~4× SD's native size: NHWC convs + tiled VAE + sliced attention keep it within VRAM
+    import torch
+    pipe.unet.to(memory_format=torch.channels_last)
+    pipe.vae.to(memory_format=torch.channels_last)
+    pipe.enable_vae_tiling()
+    pipe.enable_attention_slicing("auto")
+    try:
+        pipe.enable_xformers_memory_efficient_attention()  # CUDA only; DML keeps the sliced processor
+    except Exception:
+        pass
+
+def _quantize_pipe(pipe):
+    # int8 weights for text encoder + VAE (pip install optimum-quanto); UNet stays fp16
+    from optimum.quanto import quantize, freeze, qint8
+    for module in (pipe.text_encoder, pipe.vae):
+        quantize(module, weights=qint8)
+        freeze(module)
+
+def onnx_dir_for(model_dir: str) -> str:
+    # written by "Export ONNX (DirectML)"; the export has dynamic shapes, so one per model serves every resolution
+    return os.path.join(model_dir, "onnx")
+
+def _is_onnx(pipe) -> bool:
+    try:
+        from optimum.onnxruntime import ORTStableDiffusionPipeline
+    except ImportError:
+        return False
+    return isinstance(pipe, ORTStableDiffusionPipeline)
+
+def _load_onnx_pipe(model_dir: str, device_index=0):
+    # pre-exported ONNX graph on onnxruntime's DirectML EP; None -> use the torch-directml path
+    opt_dir = onnx_dir_for(model_dir)
+    if not os.path.isdir(opt_dir):
+        return None
+    try:
+        from optimum.onnxruntime import ORTStableDiffusionPipeline
+        return ORTStableDiffusionPipeline.from_pretrained(
+            opt_dir, provider="DmlExecutionProvider", provider_options={"device_id": device_index}
+        )
+    except Exception:
+        return None
+
+def _slot_lock(slot) -> threading.RLock:
+    with _PIPE_LOCK:
+        return _PIPE_LOCKS.setdefault(slot, threading.RLock())
+
+@contextmanager
+def _using_pipe(model_dir: str, width: int, height: int, quantize=False, device_index=0):
+    # exclusive use of the slot's pipe: a concurrent Generate / 4× Set waits instead of sharing
+    # the scheduler state or having the pipe replaced under it by a settings change
+    with _slot_lock((os.path.realpath(model_dir), device_index)):
+        yield _get_pipe(model_dir, width, height, quantize=quantize, device_index=device_index)
+
+def _get_pipe(model_dir: str, width: int, height: int, dtype=None, quantize=False, device_index=0):
+    import torch
+    import torch_directml
+    from diffusers import AutoPipelineForText2Image
+    # the ONNX export keeps its own (fp32) weights and can't be quantized here, so it is only
+    # used when the caller asked for neither; explicit dtype/quantize go to the torch path
+    use_onnx = dtype is None and not quantize
+    dtype = dtype or torch.float16
+    slot = (os.path.realpath(model_dir), device_index)
+    key = (dtype, width, height, quantize)
+    with _slot_lock(slot):
+        cached = _PIPE_CACHE.get(slot)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        if cached is not None:
+            # settings changed: release the old pipe before loading the new one
+            del _PIPE_CACHE[slot], cached
+            gc.collect()
+        pipe = _load_onnx_pipe(model_dir, device_index) if use_onnx else None
+        if pipe is not None:
+            pipe("warmup", num_inference_steps=1, guidance_scale=0.0, width=width, height=height)
+            _PIPE_CACHE[slot] = (key, pipe)
+            return pipe
+        pipe = AutoPipelineForText2Image.from_pretrained(
+            model_dir, torch_dtype=dtype, local_files_only=True
+        ).to(torch_directml.device(device_index))
+        pipe.set_progress_bar_config(disable=True)
+        # wallpapers are local-only; skip the extra CLIP classifier pass per image
+        pipe.safety_checker = None
+        pipe.requires_safety_checker = False
+        pipe.unet.eval(); pipe.vae.eval()
+        _tune_pipe(pipe)
+        if quantize:
+            _quantize_pipe(pipe)
+        with torch.inference_mode():
+            pipe("warmup", num_inference_steps=1, guidance_scale=0.0, width=width, height=height)
+        _PIPE_CACHE[slot] = (key, pipe)
+        return pipe
+
 @dataclass
 class GenConfig:
     model_dir: str
@@ -20,10 +134,33 @@ class GenConfig:
     guidance: float = 0.0
     seed: int | None = None
     out_path: str = "ai_wallpaper.png"
+    quantize: bool = False
+
+    def __post_init__(self):
+        # snap to SD's 64px tile so DirectML sees a stable shape
+        self.width = (self.width + 63) & ~63
+        self.height = (self.height + 63) & ~63
+
+    def generator(self, pipe):
+        if self.seed is None:
+            return None
+        if _is_onnx(pipe):
+            import numpy as np
+            return np.random.RandomState(self.seed)
+        import torch
+        return torch.Generator(device="cpu").manual_seed(self.seed)
+
+    def generators(self, pipe, n: int):
+        # one freshly seeded generator per prompt: every time-of-day variant starts from the
+        # same latent noise (same scene), independent of batch size and adapter count
+        if self.seed is None:
+            return None
+        return [self.generator(pipe) for _ in range(n)]
 
 class GenWorker(QtCore.QThread):
     progress = QtCore.pyqtSignal(str)
     done = QtCore.pyqtSignal(str)
+    preview = QtCore.pyqtSignal(QtGui.QImage)
 
     def __init__(self, cfg: GenConfig):
         super().__init__()
@@ -33,29 +170,40 @@ class GenWorker(QtCore.QThread):
         self.progress.emit("loading pipeline…")
         try:
             import torch
-            import torch_directml
-            from diffusers import AutoPipelineForText2Image
-            device = torch_directml.device()
-            pipe = AutoPipelineForText2Image.from_pretrained(
-                self.cfg.model_dir, torch_dtype=torch.float16
-            ).to(device)
-            if self.cfg.seed is not None:
-                import random
-                torch.manual_seed(self.cfg.seed)
-                random.seed(self.cfg.seed)
-            self.progress.emit("generating…")
-            image = pipe(
-                self.cfg.prompt,
-                num_inference_steps=self.cfg.steps,
-                guidance_scale=self.cfg.guidance,
-                width=self.cfg.width,
-                height=self.cfg.height
-            ).images[0]
-            image.save(self.cfg.out_path)
-            self.done.emit(self.cfg.out_path)
+            with _using_pipe(self.cfg.model_dir, self.cfg.width, self.cfg.height, quantize=self.cfg.quantize) as pipe:
+                if self.cfg.seed is not None:
+                    import random
+                    torch.manual_seed(self.cfg.seed)
+                    random.seed(self.cfg.seed)
+                self.progress.emit("generating…")
+                with torch.inference_mode():
+                    image = pipe(
+                        self.cfg.prompt,
+                        num_inference_steps=self.cfg.steps,
+                        guidance_scale=self.cfg.guidance,
+                        width=self.cfg.width,
+                        height=self.cfg.height,
+                        generator=self.cfg.generator(pipe)
+                    ).images[0]
+            fut = _SAVER.submit(image.save, self.cfg.out_path, compress_level=PNG_COMPRESS_LEVEL)
+            fut.add_done_callback(self._on_saved)
+            self.preview.emit(self._thumbnail(image))
         except Exception as e:
             self.done.emit(f"ERROR: {e}")
 
+    @staticmethod
+    def _thumbnail(image) -> QtGui.QImage:
+        # downscale the in-memory image here so the GUI thread never decodes the 4K PNG
+        thumb = image.convert("RGB")
+        thumb.thumbnail((PREVIEW_MAX, PREVIEW_MAX))
+        w, h = thumb.size
+        # copy(): the QImage would otherwise point into the temporary bytes object
+        return QtGui.QImage(thumb.tobytes("raw", "RGB"), w, h, 3 * w, QtGui.QImage.Format.Format_RGB888).copy()
+
+    def _on_saved(self, fut):
+        err = fut.exception()
+        self.done.emit(f"ERROR: {err}" if err else self.cfg.out_path)
+
 class WallpaperApp(QtWidgets.QWidget):
     def __init__(self):
         super().__init__()
@@ -71,10 +219,12 @@ class WallpaperApp(QtWidgets.QWidget):
         self.modelEdit = QtWidgets.QLineEdit(r"C:\models\sd_turbo")
         self.browseBtn = QtWidgets.QPushButton("Browse…")
         self.setupBtn = QtWidgets.QPushButton("Auto-setup SD")
+        self.optimizeBtn = QtWidgets.QPushButton("Export ONNX (DirectML)")
         modelRow.addWidget(QtWidgets.QLabel("Model dir:"))
         modelRow.addWidget(self.modelEdit, 1)
         modelRow.addWidget(self.browseBtn)
         modelRow.addWidget(self.setupBtn)
+        modelRow.addWidget(self.optimizeBtn)
         layout.addLayout(modelRow)
 
         # Prompt
@@ -93,7 +243,9 @@ class WallpaperApp(QtWidgets.QWidget):
         grid.addWidget(QtWidgets.QLabel("Height"),0,2); grid.addWidget(self.hSpin,0,3)
         grid.addWidget(QtWidgets.QLabel("Steps"), 1,0); grid.addWidget(self.stepsSpin,1,1)
         grid.addWidget(QtWidgets.QLabel("Guidance"),1,2); grid.addWidget(self.guidanceSpin,1,3)
+        self.quantCheck = QtWidgets.QCheckBox("Quantize (low VRAM)")
         grid.addWidget(QtWidgets.QLabel("Seed (-1=random)"),2,0); grid.addWidget(self.seedSpin,2,1)
+        grid.addWidget(self.quantCheck,2,2,1,2)
         layout.addLayout(grid)
 
         # Actions
@@ -115,6 +267,7 @@ class WallpaperApp(QtWidgets.QWidget):
         # wire up
         self.browseBtn.clicked.connect(self._browse)
         self.setupBtn.clicked.connect(self._setup)
+        self.optimizeBtn.clicked.connect(self._optimize)
         self.genBtn.clicked.connect(self._generate_one)
         self.todBtn.clicked.connect(self._generate_set)
 
@@ -132,6 +285,18 @@ class WallpaperApp(QtWidgets.QWidget):
         self._log(f"Running: {' '.join(cmd)}")
         threading.Thread(target=lambda: subprocess.call(cmd), daemon=True).start()
 
+    def _optimize(self):
+        # export the model to ONNX once (dynamic shapes); _get_pipe picks it up for unquantized runs
+        model_dir = self.modelEdit.text().strip()
+        out_dir = onnx_dir_for(model_dir)
+        cmd = ["optimum-cli", "export", "onnx", "--model", model_dir, "--task", "text-to-image", out_dir]
+        self._log(f"Running: {' '.join(cmd)}")
+        def job():
+            rc = subprocess.call(cmd)
+            self._log(f"ONNX model saved to {out_dir} (not used when Quantize is checked)" if rc == 0
+                      else f"ERROR: export failed ({rc})")
+        threading.Thread(target=job, daemon=True).start()
+
     def _generate_one(self, *, prompt_suffix=""):
         cfg = GenConfig(
             model_dir=self.modelEdit.text().strip(),
@@ -139,7 +304,7 @@ class WallpaperApp(QtWidgets.QWidget):
             width=self.wSpin.value(), height=self.hSpin.value(),
             steps=self.stepsSpin.value(), guidance=self.guidanceSpin.value(),
             seed=None if self.seedSpin.value()<0 else self.seedSpin.value(),
-            out_path="ai_wallpaper.png"
+            out_path="ai_wallpaper.png", quantize=self.quantCheck.isChecked()
         )
         self._run_worker(cfg)
 
@@ -151,17 +316,18 @@ class WallpaperApp(QtWidgets.QWidget):
             "_sunset":", golden hour, warm rim light",
             "_night": ", starry night, deep blues, subtle glow"
         }
+        cfg = GenConfig(
+            model_dir=self.modelEdit.text().strip(),
+            prompt=self.promptEdit.toPlainText().strip(),
+            width=self.wSpin.value(), height=self.hSpin.value(),
+            steps=self.stepsSpin.value(), guidance=self.guidanceSpin.value(),
+            seed=None if self.seedSpin.value()<0 else self.seedSpin.value(),
+            quantize=self.quantCheck.isChecked()
+        )
+        prompts = [cfg.prompt + extra for extra in presets.values()]
+        out_paths = [str(base / f"wp{suf}.png") for suf in presets]
         def job():
-            for suf, extra in presets.items():
-                cfg = GenConfig(
-                    model_dir=self.modelEdit.text().strip(),
-                    prompt=self.promptEdit.toPlainText().strip() + extra,
-                    width=self.wSpin.value(), height=self.hSpin.value(),
-                    steps=self.stepsSpin.value(), guidance=self.guidanceSpin.value(),
-                    seed=None if self.seedSpin.value()<0 else self.seedSpin.value(),
-                    out_path=str(base / f"wp{suf}.png")
-                )
-                self._run_worker_blocking(cfg)
+            self._run_batch_blocking(cfg, prompts, out_paths)
             self._log(f"Saved set to {base}")
         threading.Thread(target=job, daemon=True).start()
 
@@ -169,31 +335,50 @@ class WallpaperApp(QtWidgets.QWidget):
         self.worker = GenWorker(cfg)
         self.worker.progress.connect(self._log)
         self.worker.done.connect(self._on_done)
+        self.worker.preview.connect(self._on_preview)
         self.worker.start()
         self._log("started…")
 
-    def _run_worker_blocking(self, cfg: GenConfig):
-        # used for the 4× set; runs in its own thread already
+    def _run_batch_blocking(self, cfg: GenConfig, prompts, out_paths):
+        # used for the 4× set; runs in its own thread already.
+        # prompts are sharded round-robin over every DirectML adapter (iGPU + dGPU laptops),
+        # each shard goes through its pipe as one batch (SET_BATCH at a time to bound VRAM)
         try:
-            import torch, torch_directml
-            from diffusers import AutoPipelineForText2Image
-            device = torch_directml.device()
-            pipe = AutoPipelineForText2Image.from_pretrained(cfg.model_dir, torch_dtype=torch.float16).to(device)
-            if cfg.seed is not None:
-                import random
-                torch.manual_seed(cfg.seed); random.seed(cfg.seed)
-            img = pipe(cfg.prompt, num_inference_steps=cfg.steps, guidance_scale=cfg.guidance,
-                       width=cfg.width, height=cfg.height).images[0]
-            img.save(cfg.out_path)
-            self._log(f"saved {cfg.out_path}")
+            import torch_directml
+            n = max(1, min(torch_directml.device_count(), len(prompts)))
+            shards = [(i, prompts[i::n], out_paths[i::n]) for i in range(n)]
+            if n == 1:
+                self._run_shard(cfg, *shards[0])
+            else:
+                with ThreadPoolExecutor(max_workers=n) as pool:
+                    for f in [pool.submit(self._run_shard, cfg, *shard) for shard in shards]:
+                        f.result()
         except Exception as e:
             self._log(f"ERROR: {e}")
 
+    def _run_shard(self, cfg: GenConfig, device_index, prompts, out_paths):
+        import torch
+        saves = []
+        with _using_pipe(cfg.model_dir, cfg.width, cfg.height, quantize=cfg.quantize, device_index=device_index) as pipe:
+            for i in range(0, len(prompts), SET_BATCH):
+                batch = prompts[i:i+SET_BATCH]
+                with torch.inference_mode():
+                    images = pipe(batch, num_inference_steps=cfg.steps, guidance_scale=cfg.guidance,
+                                  width=cfg.width, height=cfg.height, generator=cfg.generators(pipe, len(batch))).images
+                # encode in the background while the next batch runs
+                saves += [(path, _SAVER.submit(img.save, path, compress_level=PNG_COMPRESS_LEVEL))
+                          for path, img in zip(out_paths[i:i+SET_BATCH], images)]
+        for path, fut in saves:
+            fut.result()
+            self._log(f"saved {path}")
+
     def _on_done(self, out_path: str):
         if out_path.startswith("ERROR:"):
             self._log(out_path); return
         self._log(f"saved {out_path}")
-        pix = QtGui.QPixmap(out_path)
+
+    def _on_preview(self, thumb: QtGui.QImage):
+        pix = QtGui.QPixmap.fromImage(thumb)
         self.preview.setPixmap(pix.scaled(self.preview.size(), QtCore.Qt.AspectRatioMode.KeepAspectRatio,
                                           QtCore.Qt.TransformationMode.SmoothTransformation))
 
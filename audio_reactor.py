@@ -5,8 +5,9 @@
 #
 # pip install PyQt6 soundcard numpy
 # optional fallback: pip install sounddevice
+# optional speedups: pip install scipy numba
 #
-# Run: python audio_reactor.py
+# Run: python audio_reactor.py
 
 import sys, os, math, threading, time, ctypes
 import numpy as np
@@ -14,6 +15,42 @@ from ctypes import wintypes
 from PyQt6 import QtCore, QtGui, QtWidgets
 from PyQt6.QtCore import Qt
 
+try:
+    from scipy.fft import rfft  # pocketfft, multithreaded
+    _RFFT_KW = {"workers": -1}
+except Exception:
+    rfft = np.fft.rfft
+    _RFFT_KW = {}
+
+try:
+    from numba import njit
+except Exception:
+    njit = None
+
+def _mix_block_np(data, hann, windowed, mono):
+    # stereo -> mono into `mono`, Hann-windowed copy into `windowed`, returns mean square.
+    # All writes go to preallocated buffers so a block costs no allocations.
+    n = len(data)
+    mono = mono[:n]
+    np.add(data[:, 0], data[:, 1], out=mono)
+    mono *= 0.5
+    np.multiply(mono, hann[:n], out=windowed[:n])
+    return float(np.dot(mono, mono)) / n
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _mix_block(data, hann, windowed, mono):
+        # same as _mix_block_np, one pass and no temporaries
+        n = data.shape[0]
+        acc = 0.0
+        for i in range(n):
+            m = 0.5 * (data[i, 0] + data[i, 1])
+            acc += m * m
+            windowed[i] = m * hann[i]
+        return acc / n
+else:
+    _mix_block = _mix_block_np
+
 # ============================
 # Audio capture (loopback)
 # ============================
@@ -22,46 +59,66 @@ class AudioWorker(QtCore.QThread):
     level = QtCore.pyqtSignal(float)  # smoothed 0..1 amplitude
     spectrum = QtCore.pyqtSignal(float)  # optional spectral centroid [0..1]
 
-    def __init__(self, samplerate=48000, blocksize=1024):
+    CENTROID_EVERY = 2  # run the FFT on 1 of N blocks (~12 Hz at 48k/2048)
+    EMIT_INTERVAL = 1/60  # coalesce signals to the overlay paint rate (only bites for blocks < ~16 ms)
+    LEVEL_ALPHA = 0.15  # level EMA weight per 1024-frame block; rescaled for other block sizes
+
+    def __init__(self, samplerate=48000, blocksize=2048):
         super().__init__()
         self.samplerate = samplerate
         self.blocksize = blocksize
         self._stop = threading.Event()
+        self._hann = np.hanning(blocksize).astype(np.float32)
+        self._windowed = np.zeros(blocksize, dtype=np.float32)
+        self._mono = np.empty(blocksize, dtype=np.float32)
+        self._freqs = np.fft.rfftfreq(blocksize, d=1.0/samplerate).astype(np.float32)
+        self._smooth = 0.0
+        self._centroid = 0.0
+        self._block_no = 0
+        self._last_emit = 0.0
+        # same smoothing time constant whatever the block size: bigger blocks -> bigger step
+        self._alpha = 1.0 - (1.0 - self.LEVEL_ALPHA) ** (blocksize / 1024)
 
     def stop(self):
         self._stop.set()
 
+    def _process(self, data):
+        # shared by both backends: smoothed level every block, centroid every CENTROID_EVERY blocks,
+        # both emitted at most once per EMIT_INTERVAL
+        data = data[:self.blocksize]
+        rms = float(np.sqrt(_mix_block(data, self._hann, self._windowed, self._mono)) + 1e-9)
+        # compress a bit for UI
+        db = min(1.0, (rms*8.0))   # tweak gain as desired
+        alpha = self._alpha
+        self._smooth = (1-alpha)*self._smooth + alpha*db
+        self._block_no += 1
+        if self._block_no % self.CENTROID_EVERY == 0 and len(data) == self.blocksize:
+            # simple spectral centroid for fun (0..1)
+            mag = np.abs(rfft(self._windowed, **_RFFT_KW))
+            s = float(mag.sum())
+            if s > 1e-8:
+                centroid = float(mag @ self._freqs) / (s + 1e-12)
+                self._centroid = max(0.0, min(1.0, centroid/8000.0))
+            else:
+                self._centroid = 0.0
+        now = time.monotonic()
+        if now - self._last_emit >= self.EMIT_INTERVAL:
+            self._last_emit = now
+            self.level.emit(self._smooth)
+            self.spectrum.emit(self._centroid)
+
     def _run_soundcard(self):
         import soundcard as sc
         spk = sc.default_speaker()
         mic = sc.get_microphone(id=str(spk.name), include_loopback=True)
-        alpha = 0.15
-        smooth = 0.0
         with mic.recorder(samplerate=self.samplerate, channels=2) as rec:
             while not self._stop.is_set():
                 data = rec.record(numframes=self.blocksize)  # shape (N, 2)
                 if data is None or len(data)==0: continue
-                mono = data.mean(axis=1).astype(np.float32)
-                rms = float(np.sqrt(np.mean(mono**2)) + 1e-9)
-                # compress a bit for UI
-                db = min(1.0, (rms*8.0))   # tweak gain as desired
-                smooth = (1-alpha)*smooth + alpha*db
-                # simple spectral centroid for fun (0..1)
-                spec = np.fft.rfft(mono * np.hanning(len(mono)))
-                mag = np.abs(spec)
-                if mag.sum() > 1e-8:
-                    freqs = np.fft.rfftfreq(len(mono), d=1.0/self.samplerate)
-                    centroid = (mag*freqs).sum()/(mag.sum()+1e-12)
-                    norm_centroid = max(0.0, min(1.0, centroid/8000.0))
-                else:
-                    norm_centroid = 0.0
-                self.level.emit(smooth)
-                self.spectrum.emit(norm_centroid)
+                self._process(data)
 
     def _run_sounddevice(self):
         import sounddevice as sd
-        alpha = 0.15
-        smooth = 0.0
         # try WASAPI loopback extra settings
         try:
             extra = sd.WasapiSettings(loopback=True)
@@ -72,20 +129,7 @@ class AudioWorker(QtCore.QThread):
             while not self._stop.is_set():
                 data, _ = stream.read(self.blocksize)  # (N, 2)
                 if data is None or len(data)==0: continue
-                mono = data.mean(axis=1).astype(np.float32)
-                rms = float(np.sqrt(np.mean(mono**2)) + 1e-9)
-                db = min(1.0, (rms*8.0))
-                smooth = (1-alpha)*smooth + alpha*db
-                spec = np.fft.rfft(mono * np.hanning(len(mono)))
-                mag = np.abs(spec)
-                if mag.sum() > 1e-8:
-                    freqs = np.fft.rfftfreq(len(mono), d=1.0/self.samplerate)
-                    centroid = (mag*freqs).sum()/(mag.sum()+1e-12)
-                    norm_centroid = max(0.0, min(1.0, centroid/8000.0))
-                else:
-                    norm_centroid = 0.0
-                self.level.emit(smooth)
-                self.spectrum.emit(norm_centroid)
+                self._process(data)
 
     def run(self):
         try:
@@ -97,12 +141,10 @@ class AudioWorker(QtCore.QThread):
                 import sounddevice  # noqa
                 self._run_sounddevice()
             except Exception as e:
-                # Emit zeros, keep UI alive
+                # Emit zeros once and let the thread end; overlays idle at amp=0
                 print("Audio backends failed:", e)
-                while not self._stop.is_set():
-                    self.level.emit(0.0)
-                    self.spectrum.emit(0.0)
-                    self.msleep(33)
+                self.level.emit(0.0)
+                self.spectrum.emit(0.0)
 
 # ============================
 # Win32 helpers (window rects / DPI)
@@ -164,19 +206,24 @@ def get_window_rect(hwnd):
         user32.GetWindowRect(hwnd, ctypes.byref(r))
     return r
 
+_dpi_by_hmon = {}  # HMONITOR -> scale; cleared by Controller when screens/DPI change
+
 def dpi_scale_for_rect(rect):
     # map a rect to its monitor and get effective DPI (96=1.0)
     MONITOR_DEFAULTTONEAREST = 2
-    MONITORINFOEXW = 0
     hmon = user32.MonitorFromRect(ctypes.byref(rect), MONITOR_DEFAULTTONEAREST)
+    scale = _dpi_by_hmon.get(hmon)
+    if scale is not None:
+        return scale
+    scale = 1.0  # fallback
     if shcore:
         MDT_EFFECTIVE_DPI = 0
         dpiX = ctypes.c_uint(); dpiY = ctypes.c_uint()
         if shcore.GetDpiForMonitor(hmon, MDT_EFFECTIVE_DPI,
                                    ctypes.byref(dpiX), ctypes.byref(dpiY)) == 0:
-            return dpiX.value / 96.0
-    # fallback
-    return 1.0
+            scale = dpiX.value / 96.0
+    _dpi_by_hmon[hmon] = scale
+    return scale
 
 def enumerate_windows():
     result = []
@@ -194,6 +241,87 @@ def enumerate_windows():
     user32.EnumWindows(cb, 0)
     return result
 
+WinEventProc = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                  wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_SYSTEM_MINIMIZESTART = 0x0016
+EVENT_SYSTEM_MINIMIZEEND = 0x0017
+EVENT_OBJECT_CREATE = 0x8000
+EVENT_OBJECT_DESTROY = 0x8001
+EVENT_OBJECT_SHOW = 0x8002
+EVENT_OBJECT_HIDE = 0x8003
+EVENT_OBJECT_LOCATIONCHANGE = 0x800B
+EVENT_OBJECT_NAMECHANGE = 0x800C
+EVENT_OBJECT_CLOAKED = 0x8017
+EVENT_OBJECT_UNCLOAKED = 0x8018
+# events that can change which windows pass is_window_visible_top -> full re-enumeration
+STRUCTURAL_EVENTS = frozenset((
+    EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_MINIMIZESTART, EVENT_SYSTEM_MINIMIZEEND,
+    EVENT_OBJECT_CREATE, EVENT_OBJECT_DESTROY, EVENT_OBJECT_SHOW, EVENT_OBJECT_HIDE,
+    EVENT_OBJECT_NAMECHANGE, EVENT_OBJECT_CLOAKED, EVENT_OBJECT_UNCLOAKED,
+))
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+
+class WindowTracker:
+    """Shared hwnd -> RECT list for all overlays.
+
+    WinEvent hooks (delivered on the GUI thread's message loop) patch rects
+    in place on move/resize and flag a full EnumWindows only when windows
+    appear, vanish, (un)minimize or (un)cloak."""
+
+    def __init__(self):
+        self._rects = {}
+        self._dirty = True
+        self.version = 0
+        self._logical = ([], np.zeros((0, 4), dtype=np.int32))
+        self._logical_version = 0
+        self._proc = WinEventProc(self._on_event)  # keep a ref so it isn't GC'd
+        flags = WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS
+        self._hooks = [
+            user32.SetWinEventHook(EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_MINIMIZEEND, None, self._proc, 0, 0, flags),
+            user32.SetWinEventHook(EVENT_OBJECT_CREATE, EVENT_OBJECT_UNCLOAKED, None, self._proc, 0, 0, flags),
+        ]
+
+    def _on_event(self, hook, event, hwnd, id_object, id_child, thread, ms):
+        if id_object != OBJID_WINDOW or id_child != 0 or not hwnd:
+            return
+        if event == EVENT_OBJECT_LOCATIONCHANGE:
+            if hwnd in self._rects:
+                self._rects[hwnd] = get_window_rect(hwnd)
+                self.version += 1
+        elif event in STRUCTURAL_EVENTS:
+            self._dirty = True
+
+    def invalidate(self):
+        self._dirty = True
+
+    def refresh(self):
+        # re-enumerate only after a structural change; returns the current version
+        if self._dirty:
+            self._dirty = False
+            self._rects = dict(enumerate_windows())
+            self.version += 1
+        return self.version
+
+    def logical_rects(self):
+        # (hwnds, int32 [N, 4] L/T/R/B in logical px), computed once per version for all overlays
+        if self._logical_version != self.version:
+            rects = list(self._rects.values())
+            phys = np.array([(r.left, r.top, r.right, r.bottom) for r in rects], dtype=np.float64).reshape(-1, 4)
+            # map physical px -> logical (divide by DPI scale for that monitor)
+            scale = np.array([dpi_scale_for_rect(r) for r in rects], dtype=np.float64).reshape(-1, 1)
+            self._logical = (list(self._rects), (phys / scale).astype(np.int32))
+            self._logical_version = self.version
+        return self._logical
+
+    def close(self):
+        for h in self._hooks:
+            if h: user32.UnhookWinEvent(h)
+        self._hooks = []
+
 # ============================
 # Overlay windows (one per screen)
 # ============================
@@ -209,12 +337,27 @@ class Overlay(QtWidgets.QWidget):
         self.setGeometry(screen.geometry())  # logical coords
         # click-through
         self._make_clickthrough()
-        # timers
-        self.repaintTimer = QtCore.QTimer(self, interval=16, timeout=self.update)  # ~60fps
-        self.repaintTimer.start()
-        self.scanTimer = QtCore.QTimer(self, interval=300, timeout=self._scan_windows)
-        self.scanTimer.start()
+        # repaint/scan are driven by the Controller's shared timers
         self._rects = []  # logical rects on this screen
+        self._path_cache = {}  # hwnd -> ((x, y, w, h), rounded QPainterPath)
+        self._glow_path = QtGui.QPainterPath()  # every outline merged, one drawPath per pass
+        self._inner_path = None
+        self._seen_version = -1
+        # last rendered frame; paintEvent only blits it
+        self._frame = None
+        self._frame_key = None
+        self._frame_amp = self._frame_spec = -1.0
+        self._build_gradient()
+
+    def _build_gradient(self):
+        # center/radius only depend on size; the inner stop is recolored each frame
+        W, H = self.width(), self.height()
+        self._grad = QtGui.QRadialGradient(W/2, H/2, max(W,H)/1.1)
+        self._grad.setColorAt(1.0, QtGui.QColor(0,0,0,0))
+
+    def resizeEvent(self, e):
+        self._build_gradient()
+        super().resizeEvent(e)
 
     def _make_clickthrough(self):
         hwnd = int(self.winId())
@@ -224,63 +367,96 @@ class Overlay(QtWidgets.QWidget):
         style = user32.GetWindowLongW(hwnd, GWL_EXSTYLE)
         user32.SetWindowLongW(hwnd, GWL_EXSTYLE, style | WS_EX_LAYERED | WS_EX_TRANSPARENT)
 
-    def _scan_windows(self):
-        # collect rects that intersect this overlay's screen
+    def scan_windows(self):
+        # collect rects that intersect this overlay's screen (no-op if the tracker hasn't changed)
+        version = self.ctrl.windows.refresh()
+        if version == self._seen_version:
+            return
+        self._seen_version = version
         screen_geo = self.geometry()
         sx, sy, sw, sh = screen_geo.x(), screen_geo.y(), screen_geo.width(), screen_geo.height()
-        screen_rect = (sx, sy, sx+sw, sy+sh)
-        rects = []
-        for hwnd, r in enumerate_windows():
-            # map physical px -> logical (divide by DPI scale for that monitor)
-            scale = dpi_scale_for_rect(r)
-            L, T = int(r.left/scale), int(r.top/scale)
-            R, B = int(r.right/scale), int(r.bottom/scale)
-            # keep ones that intersect our screen
-            if (R > sx and L < sx+sw and B > sy and T < sy+sh):
-                rects.append((hwnd, QtCore.QRect(L, T, R-L, B-T)))
+        hwnds, ltrb = self.ctrl.windows.logical_rects()
+        L, T, R, B = ltrb.T
+        # keep ones that intersect our screen
+        hit = np.flatnonzero((R > sx) & (L < sx+sw) & (B > sy) & (T < sy+sh))
+        rects = [(hwnds[i], QtCore.QRect(int(L[i]), int(T[i]), int(R[i]-L[i]), int(B[i]-T[i]))) for i in hit]
         self._rects = rects
+        # reuse outline paths whose rect didn't move; windows that went away drop out
+        paths = {}
+        for hwnd, r in rects:
+            key = (r.x(), r.y(), r.width(), r.height())
+            cached = self._path_cache.get(hwnd)
+            if cached is None or cached[0] != key:
+                path = QtGui.QPainterPath()
+                path.addRoundedRect(QtCore.QRectF(r.adjusted(2,2,-2,-2)), 12.0, 12.0)  # shrink slightly inside edges
+                cached = (key, path)
+            paths[hwnd] = cached
+        self._path_cache = paths
+        self._glow_path = QtGui.QPainterPath()
+        for _, path in paths.values():
+            self._glow_path.addPath(path)
+        self._inner_path = None  # (fg hwnd, all outlines except fg), rebuilt lazily in _render
+
+    def _inner_paths(self, fg):
+        if self._inner_path is None or self._inner_path[0] != fg:
+            path = QtGui.QPainterPath()
+            for hwnd, (_, sub) in self._path_cache.items():
+                if hwnd != fg:
+                    path.addPath(sub)
+            self._inner_path = (fg, path)
+        return self._inner_path[1]
+
+    def tick(self):
+        # re-render only when audio moved noticeably or the outlines changed; otherwise no repaint at all
+        amp = self.ctrl.current_amp  # 0..1
+        spc = self.ctrl.current_spec  # 0..1
+        fg = user32.GetForegroundWindow()
+        key = (self._seen_version, fg, self.width(), self.height())
+        if (self._frame is None or key != self._frame_key
+                or abs(amp - self._frame_amp) >= 0.01 or abs(spc - self._frame_spec) >= 0.01):
+            self._render(fg)
+            self._frame_key, self._frame_amp, self._frame_spec = key, amp, spc
+            self.update()
 
     def paintEvent(self, e):
+        if self._frame is None:
+            return
         p = QtGui.QPainter(self)
-        p.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing, True)
+        p.drawPixmap(0, 0, self._frame)
+        p.end()
 
-        W, H = self.width(), self.height()
-        amp = self.ctrl.current_amp  # 0..1
-        spc = self.ctrl.current_spec  # 0..1
+    def _render(self, fg):
+        dpr = self.devicePixelRatioF()
+        if self._frame is None or self._frame.size() != self.size() * dpr:
+            self._frame = QtGui.QPixmap(self.size() * dpr)
+            self._frame.setDevicePixelRatio(dpr)
+        self._frame.fill(Qt.GlobalColor.transparent)
+        p = QtGui.QPainter(self._frame)
+        p.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing, True)
 
         # ==== 1) Global ambient (subtle) ====
-        # opacity tied to amplitude; hue shift with centroid
-        hue = int(200 + 100*spc) % 360
-        col = QtGui.QColor.fromHsv(hue, 80, 255, int(80 * min(1.0, 0.2 + amp*0.8)))
-        grad = QtGui.QRadialGradient(W/2, H/2, max(W,H)/1.1)
-        grad.setColorAt(0.0, col)
-        grad.setColorAt(1.0, QtGui.QColor(0,0,0,0))
+        # opacity tied to amplitude; hue shift with centroid (color comes from the controller)
+        self._grad.setColorAt(0.0, self.ctrl.ambient_color)
         p.setCompositionMode(QtGui.QPainter.CompositionMode.CompositionMode_Screen)
-        p.fillRect(self.rect(), QtGui.QBrush(grad))
+        p.fillRect(self.rect(), QtGui.QBrush(self._grad))
 
         # ==== 2) Window outlines ====
-        # base alpha scales with amp; foreground window gets boost
-        fg = user32.GetForegroundWindow()
-
-        base_alpha = int(20 + 140*amp)          # 20..160
-        thick = max(1.0, 2.0 + 6.0*amp)         # pen width
-        glow_alpha = int(10 + 110*amp)          # outer soft pass
-
-        for hwnd, r in self._rects:
-            rr = r.adjusted(2,2,-2,-2)          # shrink slightly inside edges
-            path = QtGui.QPainterPath()
-            radius = 12.0
-            path.addRoundedRect(rr, radius, radius)
+        # pens are rebuilt by the controller only when amp/spec change; foreground window gets boost
+        glow_pen, inner_pen, fg_pen = self.ctrl.glow_pen, self.ctrl.inner_pen, self.ctrl.fg_pen
 
-            # soft outer glow pass
-            p.setCompositionMode(QtGui.QPainter.CompositionMode.CompositionMode_Screen)
-            p.setPen(QtGui.QPen(QtGui.QColor(hue, 120, 255, glow_alpha), thick*2.0))
-            p.drawPath(path)
+        # soft outer glow pass; it's a blurry screen-blend so skip AA
+        p.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing, False)
+        p.setPen(glow_pen)
+        p.drawPath(self._glow_path)
 
-            # crisp inner stroke
-            alpha = base_alpha + (70 if hwnd == fg else 0)
-            p.setPen(QtGui.QPen(QtGui.QColor(hue, 60, 255, min(alpha, 255)), thick))
-            p.drawPath(path)
+        # crisp inner stroke
+        p.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing, True)
+        p.setPen(inner_pen)
+        p.drawPath(self._inner_paths(fg))
+        fg_path = self._path_cache.get(fg)
+        if fg_path is not None:
+            p.setPen(fg_pen)
+            p.drawPath(fg_path[1])
 
         p.end()
 
@@ -294,8 +470,17 @@ class Controller(QtWidgets.QWidget):
         self.setWindowTitle("Audio-Reactive Overlay (All Windows)")
         self.current_amp = 0.0
         self.current_spec = 0.0
+        self.frame_interval = 16
+        self._update_pens()
         self._build_ui()
 
+        # shared window rects, kept fresh by WinEvent hooks
+        self.windows = WindowTracker()
+        app.screenAdded.connect(self._on_screens_changed)
+        app.screenRemoved.connect(self._on_screens_changed)
+        for s in app.screens():
+            s.logicalDotsPerInchChanged.connect(self._on_screens_changed)
+
         # audio worker
         self.audio = AudioWorker()
         self.audio.level.connect(self._on_level)
@@ -309,6 +494,12 @@ class Controller(QtWidgets.QWidget):
             ov.show()
             self._overlays.append(ov)
 
+        # one paint + one scan timer for all overlays so repaints land in phase
+        self.paintTimer = QtCore.QTimer(self, interval=self.frame_interval, timeout=self._tick_all)  # ~60fps
+        self.paintTimer.start()
+        self.scanTimer = QtCore.QTimer(self, interval=100, timeout=self._scan_all)
+        self.scanTimer.start()
+
         # perf timer (optional FPS limiter toggle)
         self.fpsLimiter = QtCore.QTimer(self, interval=1000, timeout=self._update_stats)
         self.fpsLimiter.start()
@@ -321,10 +512,15 @@ class Controller(QtWidgets.QWidget):
             self.audio.wait(500)
         except Exception:
             pass
+        self.windows.close()
         for ov in self._overlays:
             ov.close()
         e.accept()
 
+    def _on_screens_changed(self, *_):
+        _dpi_by_hmon.clear()
+        self.windows.invalidate()
+
     def _build_ui(self):
         layout = QtWidgets.QFormLayout(self)
         self.intensity = QtWidgets.QDoubleSpinBox(); self.intensity.setRange(0.1, 3.0); self.intensity.setSingleStep(0.05); self.intensity.setValue(1.0)
@@ -346,10 +542,27 @@ class Controller(QtWidgets.QWidget):
         # apply noise gate + user intensity
         thr = self.threshold.value()
         a = 0.0 if a < thr else (a - thr) / (1.0 - thr)
-        self.current_amp = max(0.0, min(1.0, a * self.intensity.value()))
+        amp = max(0.0, min(1.0, a * self.intensity.value()))
+        if amp != self.current_amp:
+            self.current_amp = amp
+            self._update_pens()
 
     def _on_spec(self, s):
-        self.current_spec = s
+        if s != self.current_spec:
+            self.current_spec = s
+            self._update_pens()
+
+    def _update_pens(self):
+        # outline pens shared by every overlay; base alpha scales with amp
+        amp = self.current_amp
+        hue = int(200 + 100*self.current_spec) % 360
+        base_alpha = int(20 + 140*amp)          # 20..160
+        thick = max(1.0, 2.0 + 6.0*amp)         # pen width
+        glow_alpha = int(10 + 110*amp)          # outer soft pass
+        self.ambient_color = QtGui.QColor.fromHsv(hue, 80, 255, int(80 * min(1.0, 0.2 + amp*0.8)))
+        self.glow_pen = QtGui.QPen(QtGui.QColor(hue, 120, 255, glow_alpha), thick*2.0)
+        self.inner_pen = QtGui.QPen(QtGui.QColor(hue, 60, 255, min(base_alpha, 255)), thick)
+        self.fg_pen = QtGui.QPen(QtGui.QColor(hue, 60, 255, min(base_alpha + 70, 255)), thick)
 
     def _toggle_overlays(self):
         any_visible = any(ov.isVisible() for ov in self._overlays)
@@ -357,9 +570,22 @@ class Controller(QtWidgets.QWidget):
             ov.setVisible(not any_visible)
 
     def _apply_latency(self):
-        iv = self.latency.value()
+        self.frame_interval = self.latency.value()
+        self.paintTimer.setInterval(self.frame_interval)
+
+    IDLE_INTERVAL = 100  # ms between ticks while the noise gate is closed
+
+    def _tick_all(self):
+        for ov in self._overlays:
+            if ov.isVisible():
+                ov.tick()
+        iv = self.IDLE_INTERVAL if self.current_amp <= 0.0 else self.frame_interval
+        if self.paintTimer.interval() != iv:
+            self.paintTimer.setInterval(iv)
+
+    def _scan_all(self):
         for ov in self._overlays:
-            ov.repaintTimer.setInterval(iv)
+            ov.scan_windows()
 
     def _update_stats(self):
         self.status.setText(f"Amp={self.current_amp:.2f}  Spec={self.current_spec:.2f}  Monitors={len(self._overlays)}")
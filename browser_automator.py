@@ -2,36 +2,95 @@ import os
 import re
 import sys
 import json
+import math
 import time
+import collections
+import heapq
+import atexit
+import base64
+import asyncio
+import threading
 import datetime
 import subprocess
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
+from functools import lru_cache, partial
 from typing import List, Optional, Dict, Any
 
 # ---------------- PyQt6 ----------------
-from PyQt6.QtCore import Qt, QTimer, QThread, pyqtSignal, QDate, QTime, QSize
+from PyQt6.QtCore import Qt, QObject, QTimer, QThread, pyqtSignal, QDate, QTime, QSize
+from PyQt6.QtGui import QColor, QPalette
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
     QTabWidget, QLabel, QLineEdit, QPushButton, QComboBox, QCheckBox,
-    QFileDialog, QMessageBox, QListWidget, QListWidgetItem, QSpinBox,
+    QFileDialog, QMessageBox, QListWidget, QSpinBox,
     QDoubleSpinBox, QPlainTextEdit, QScrollArea
 )
 
+try:  # imported once; the recorder/scripts tabs still work without it
+    from playwright.async_api import async_playwright
+except ImportError:
+    async_playwright = None
+
 # ---------------- Globals & Paths ----------------
 APP_TITLE = "Playwright Assistant — Recorder • Scripts • Visual Flows • Schedules (PyQt6)"
 default_dir = os.path.join(os.getcwd(), "recordings")
 flows_dir = os.path.join(os.getcwd(), "flows")
 for d in (default_dir, flows_dir):
     os.makedirs(d, exist_ok=True)
+SCHED_TICK_S = 5  # scheduler resolution; schedules are minute-grained, "+10 s" quick jobs still fire promptly
 
 # --------------- Helpers -----------------
+try:  # optional: pip install orjson (2-5x faster flow load/save)
+    import orjson
+    _loads = orjson.loads
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    _loads = json.loads
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2).encode("utf-8")
+
+def read_flow_file(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        return _loads(f.read())
+
+_HEADLESS_RE = re.compile(r"headless\s*=\s*[^,\)]+,?\s*")
+_LAUNCH_RE = re.compile(r"(launch\()")
+_CLOSE_RE = re.compile(r"^[ \t]*browser\.close\(\)[ \t]*\n", re.M)
+
 def inject_headless_flag(code: str) -> str:
-    code = re.sub(r"headless\s*=\s*[^,\)]+,?\s*", "", code)
-    code = re.sub(r"(launch\()", r"\1headless=HEADLESS, ", code)
+    if "headless" in code:
+        code = _HEADLESS_RE.sub("", code)
+    code = _LAUNCH_RE.sub(r"\1headless=HEADLESS, ", code)
     return code
 
+def strip_browser_close(code: str) -> str:
+    return _CLOSE_RE.sub("", code) if "browser.close()" in code else code
+
+def run_source(code: str, env: Dict[str, str]) -> subprocess.Popen:
+    # edited scripts go to the interpreter over stdin instead of a temp_*.py next to the original
+    proc = subprocess.Popen([sys.executable, "-"], env=env, stdin=subprocess.PIPE)
+    proc.stdin.write(code.encode("utf-8"))
+    proc.stdin.close()
+    return proc
+
+_now_cache = (0, "")  # (epoch second, formatted) — log bursts reuse the same string
+
 def now_str() -> str:
-    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    global _now_cache
+    t = int(time.time())
+    cached = _now_cache
+    if cached[0] != t:
+        cached = _now_cache = (t, datetime.datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S"))
+    return cached[1]
+
+def _write_bytes(path: str, data: bytes) -> None:
+    with open(path, "wb", buffering=1 << 20) as f:
+        f.write(data)
+
+@lru_cache(maxsize=64)
+def _parse_dt(d: str, t: str) -> datetime.datetime:
+    return datetime.datetime.strptime(f"{d} {t}", "%Y-%m-%d %H:%M")
 
 # --------------- Visual Flow Model ---------------
 ACTION_VALUES = (
@@ -43,15 +102,38 @@ ACTION_VALUES = (
     "close_browser",
 )
 
-@dataclass
+@dataclass(slots=True)
 class FlowStep:
     action: str
     selector: str = ""
     value: str = ""
     seconds: float = 0.0
 
+def optimize_steps(steps: List[FlowStep], per_step_wait: float = 0.0) -> List[tuple]:
+    """Rewrite a flow so it runs with fewer steps but the same effect.
+
+    Adjacent wait_seconds are fused into one sleep (keeping the per-step wait
+    that used to follow each), repeated close_browser steps collapse to one and
+    trailing ones are dropped since the runner tears the context down anyway.
+    Returns (first_row, last_row, step) with the 1-based rows of the original
+    flow each step covers, so logs point at what the user edited.
+    """
+    out: List[tuple] = []
+    for row, step in enumerate(steps, start=1):
+        prev = out[-1][2] if out else None
+        if prev is not None and step.action == prev.action == "wait_seconds":
+            fused = FlowStep("wait_seconds", seconds=float(prev.seconds) + per_step_wait + float(step.seconds))
+            out[-1] = (out[-1][0], row, fused)
+        elif prev is not None and step.action == prev.action == "close_browser":
+            out[-1] = (out[-1][0], row, prev)
+        else:
+            out.append((row, row, step))
+    while out and out[-1][2].action == "close_browser":
+        out.pop()
+    return out
+
 # --------------- Scheduler ----------------
-@dataclass
+@dataclass(slots=True)
 class ScheduledJob:
     job_id: int
     kind: str                 # "script" | "flow"
@@ -67,6 +149,10 @@ class Scheduler:
         self.on_fire = on_fire_callback
         self.jobs: Dict[int, ScheduledJob] = {}
         self._counter = 0
+        # min-heap of (next_run timestamp, job_id); entries for removed jobs are
+        # left in place and skipped when popped
+        self._heap: List[tuple] = []
+        self._next_due_ts = math.inf  # earliest heap timestamp; tick() is a no-op before it
 
     def next_id(self) -> int:
         self._counter += 1
@@ -74,6 +160,9 @@ class Scheduler:
 
     def add(self, job: ScheduledJob) -> None:
         self.jobs[job.job_id] = job
+        ts = job.next_run.timestamp()
+        heapq.heappush(self._heap, (ts, job.job_id))
+        self._next_due_ts = min(self._next_due_ts, ts)
 
     def remove(self, job_id: int) -> None:
         self.jobs.pop(job_id, None)
@@ -82,17 +171,131 @@ class Scheduler:
         return list(self.jobs.values())
 
     def tick(self) -> None:
+        if time.time() < self._next_due_ts:
+            return
         now = datetime.datetime.now()
-        due = [j for j in self.jobs.values() if j.next_run <= now]
-        for j in due:
+        now_ts = now.timestamp()
+        while self._heap and self._heap[0][0] <= now_ts:
+            ts, jid = heapq.heappop(self._heap)
+            j = self.jobs.get(jid)
+            if j is None or j.next_run.timestamp() != ts:
+                continue  # removed or rescheduled since this entry was pushed
             self.on_fire(j)
             if j.every_seconds:
                 j.next_run = now + datetime.timedelta(seconds=j.every_seconds)
+                heapq.heappush(self._heap, (j.next_run.timestamp(), jid))
             else:
-                self.remove(j.job_id)
+                self.remove(jid)
+        self._next_due_ts = self._heap[0][0] if self._heap else math.inf
+
+# --------------- Browser Pool ---------------
+MAX_BROWSERS = 2  # browsers open at once per (browser, headless); extra flows wait for one to be released
+
+class BrowserPool:
+    """Warm Playwright browsers shared by every FlowRunner.
+
+    Owns one asyncio loop thread running async Playwright; flows are
+    coroutines on that loop, so several can run concurrently without a
+    thread each. The loop is started by the first submit(), not at import.
+    rent()/release() must be awaited on the pool's loop; every successful
+    rent() must be paired with one release().
+    """
+    def __init__(self, max_browsers: int = MAX_BROWSERS):
+        self.max_browsers = max_browsers
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._pw = None
+        self._pw_lock: Optional[asyncio.Lock] = None
+        self._closed = False
+        self._idle: Dict[tuple, List[Any]] = {}
+        self._slots: Dict[tuple, asyncio.Semaphore] = {}  # caps rented browsers per key
+
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self.loop.run_forever, name="playwright", daemon=True)
+                self._thread.start()
+        return self.loop
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    async def _playwright(self):
+        if self._pw_lock is None:
+            self._pw_lock = asyncio.Lock()
+        async with self._pw_lock:
+            if self._pw is None:
+                if async_playwright is None:
+                    raise ImportError("Playwright is not installed (pip install playwright)")
+                self._pw = await async_playwright().start()
+        return self._pw
+
+    async def rent(self, kind: str, headless: bool):
+        key = (kind, headless)
+        slots = self._slots.get(key)
+        if slots is None:
+            slots = self._slots[key] = asyncio.Semaphore(self.max_browsers)
+        await slots.acquire()
+        try:
+            idle = self._idle.setdefault(key, [])
+            while idle:
+                browser = idle.pop()
+                if browser.is_connected():
+                    return browser
+            pw = await self._playwright()
+            return await getattr(pw, kind).launch(headless=headless)
+        except BaseException:
+            slots.release()
+            raise
+
+    async def release(self, browser, kind: str, headless: bool):
+        key = (kind, headless)
+        try:
+            for ctx in list(browser.contexts):
+                await ctx.close()
+            idle = self._idle[key]
+            if len(idle) < self.max_browsers:
+                idle.append(browser)
+            else:
+                await browser.close()
+        except Exception:
+            pass
+        finally:
+            self._slots[key].release()
+
+    async def _close_all(self):
+        for idle in self._idle.values():
+            while idle:
+                try:
+                    await idle.pop().close()
+                except Exception:
+                    pass
+        if self._pw is not None:
+            await self._pw.stop()
+            self._pw = None
 
-# --------------- QThread for Flow Runner ---------------
-class FlowRunner(QThread):
+    def close(self):
+        # runs on aboutToQuit and again at exit; the loop is gone after the first call
+        if self._closed:
+            return
+        self._closed = True
+        if self.loop is None:
+            return  # no flow ever ran
+        try:
+            self.submit(self._close_all()).result(timeout=10)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+_POOL = BrowserPool()
+atexit.register(_POOL.close)  # stop the Node driver even if Qt never emits aboutToQuit
+
+# --------------- Flow Runner ---------------
+class FlowRunner(QObject):
+    """Runs one visual flow as a coroutine on the pool's loop; signals are
+    emitted from that loop thread."""
     log_signal = pyqtSignal(str)
     done_signal = pyqtSignal()
 
@@ -101,70 +304,119 @@ class FlowRunner(QThread):
         self.steps = steps
         self.cfg = cfg
         self.save_dir = save_dir
+        self._future = None
 
     def log(self, msg: str):
         self.log_signal.emit(f"{msg}")
 
-    def run(self):
+    def start(self):
+        self._future = _POOL.submit(self._run_async())
+
+    async def _run_async(self):
         try:
-            from playwright.sync_api import sync_playwright
-        except Exception as e:
-            self.log(f"Playwright not available: {e}")
+            await self._run_flow()
+        finally:
             self.done_signal.emit()
+
+    async def _run_flow(self):
+        kind = self.cfg.get("browser", "chromium")
+        headless = bool(self.cfg.get("headless", False))
+        try:
+            browser = await _POOL.rent(kind, headless)
+        except ImportError as e:
+            self.log(f"Playwright not available: {e}")
+            return
+        except Exception as e:
+            self.log(f"Flow error: {e}")
             return
 
         self.log("Flow starting…")
+        self._browser, self._context, self._page = browser, None, None
+        label = ""
         try:
-            with sync_playwright() as p:
-                browser_type = getattr(p, self.cfg.get("browser", "chromium"))
-                browser = browser_type.launch(headless=bool(self.cfg.get("headless", False)))
-                context = browser.new_context()
-                page = context.new_page()
-
-                per_step = float(self.cfg.get("per_step_wait", 0.0))
-
-                for i, step in enumerate(self.steps, start=1):
-                    self.log(f"[Step {i}] {step.action}")
-                    if step.action == "open_url":
-                        if not step.selector:
-                            raise ValueError("open_url requires URL in 'selector'")
-                        page.goto(step.selector)
-                    elif step.action == "click_selector":
-                        page.click(step.selector)
-                    elif step.action == "type_text":
-                        page.fill(step.selector, step.value)
-                    elif step.action == "wait_seconds":
-                        time.sleep(float(step.seconds))
-                    elif step.action == "screenshot":
-                        fname = f"snap_{datetime.datetime.now().strftime('%H%M%S_%f')}.png"
-                        path = os.path.join(self.save_dir, fname)
-                        page.screenshot(path=path, full_page=True)
-                        self.log(f"Saved screenshot: {fname}")
-                    elif step.action == "close_browser":
-                        try:
-                            browser.close()
-                        except Exception:
-                            pass
-                        if i < len(self.steps):
-                            browser = browser_type.launch(headless=bool(self.cfg.get("headless", False)))
-                            context = browser.new_context()
-                            page = context.new_page()
-                    else:
-                        raise ValueError(f"Unknown action: {step.action}")
-
-                    if per_step > 0:
-                        time.sleep(per_step)
+            per_step = float(self.cfg.get("per_step_wait", 0.0))
+            steps = optimize_steps(self.steps, per_step)
+            # action -> bound handler, resolved once per run instead of an if/elif chain per step
+            handlers = {
+                "open_url": self._open_url,
+                "click_selector": self._click_selector,
+                "type_text": self._type_text,
+                "wait_seconds": self._wait_seconds,
+                "screenshot": self._screenshot,
+                "close_browser": self._close_browser,
+            }
+            log, sleep = self.log, asyncio.sleep
 
-                try:
-                    browser.close()
-                except Exception:
-                    pass
+            for first, last, step in steps:
+                label = f"Step {first}" if first == last else f"Steps {first}-{last}"
+                log(f"[{label}] {step.action}")
+                handler = handlers.get(step.action)
+                if handler is None:
+                    raise ValueError(f"Unknown action: {step.action}")
+                await handler(step)
+
+                if per_step > 0:
+                    await sleep(per_step)
 
             self.log("Flow complete.")
         except Exception as e:
-            self.log(f"Flow error: {e}")
+            self.log(f"Flow error{f' at {label}' if label else ''}: {e}")
+        finally:
+            # contexts are closed on release; the browser goes back to the pool warm
+            self._context = self._page = None
+            await _POOL.release(browser, kind, headless)
+
+    # ---- step handlers ----
+    async def _page_or_new(self):
+        # a fresh context is only opened when a step actually needs a page
+        if self._page is None:
+            self._context = await self._browser.new_context()
+            self._page = await self._context.new_page()
+        return self._page
+
+    async def _open_url(self, step: FlowStep):
+        if not step.selector:
+            raise ValueError("open_url requires URL in 'selector'")
+        await (await self._page_or_new()).goto(step.selector)
+
+    async def _click_selector(self, step: FlowStep):
+        await (await self._page_or_new()).click(step.selector)
+
+    async def _type_text(self, step: FlowStep):
+        await (await self._page_or_new()).fill(step.selector, step.value)
+
+    async def _wait_seconds(self, step: FlowStep):
+        await asyncio.sleep(float(step.seconds))
+
+    async def _screenshot(self, step: FlowStep):
+        page = await self._page_or_new()
+        stamp = datetime.datetime.now().strftime('%H%M%S_%f')
+        if self.cfg.get("fast_screenshot") and self.cfg.get("browser", "chromium") == "chromium":
+            # draft quality: JPEG straight from CDP, written in one 1 MiB-buffered call off the loop
+            fname = f"snap_{stamp}.jpg"
+            cdp = await self._context.new_cdp_session(page)
+            try:
+                # clip to the whole document so this matches the PNG path's full_page=True
+                size = (await cdp.send("Page.getLayoutMetrics"))["cssContentSize"]
+                clip = {"x": 0, "y": 0, "width": size["width"], "height": size["height"], "scale": 1}
+                shot = await cdp.send("Page.captureScreenshot",
+                                      {"format": "jpeg", "quality": 80, "captureBeyondViewport": True, "clip": clip})
+            finally:
+                await cdp.detach()
+            await asyncio.to_thread(_write_bytes, os.path.join(self.save_dir, fname), base64.b64decode(shot["data"]))
+        else:
+            fname = f"snap_{stamp}.png"
+            await page.screenshot(path=os.path.join(self.save_dir, fname), full_page=True)
+        self.log(f"Saved screenshot: {fname}")
 
-        self.done_signal.emit()
+    async def _close_browser(self, step: FlowStep):
+        # drop the context (cookies, storage, pages) but keep the browser process
+        if self._context is not None:
+            try:
+                await self._context.close()
+            except Exception:
+                pass
+        self._context = self._page = None
 
 # --------------- Step Row Widget ----------------
 class StepRow(QWidget):
@@ -221,6 +473,20 @@ class StepRow(QWidget):
         )
 
 # --------------- Record Tab ----------------
+_PW_INSTALLED_MARK = os.path.join(default_dir, ".pw_installed")
+
+class InstallWorker(QThread):
+    done_signal = pyqtSignal(str)  # "" on success, else the error
+
+    def run(self):
+        try:
+            subprocess.run([sys.executable, "-m", "playwright", "install"], check=True)
+            open(_PW_INSTALLED_MARK, "w").close()
+            self.done_signal.emit("")
+        except Exception as e:
+            self.done_signal.emit(str(e) or repr(e))
+
+
 class RecordTab(QWidget):
     def __init__(self, main):
         super().__init__()
@@ -258,12 +524,24 @@ class RecordTab(QWidget):
         self.stop_btn.clicked.connect(self.stop_recording)
 
     def start_recording(self):
-        try:
-            subprocess.run([sys.executable, "-m", "playwright", "install"], check=True)
-        except subprocess.CalledProcessError as e:
-            QMessageBox.critical(self, "Error", f"Playwright install failed:\n{e}")
+        # `playwright install` only runs once; later clicks go straight to codegen
+        if os.path.exists(_PW_INSTALLED_MARK):
+            self._launch_codegen()
             return
+        self.record_btn.setEnabled(False)
+        self.main.log("Installing Playwright browsers…")
+        self.installer = InstallWorker()
+        self.installer.done_signal.connect(self._on_installed)
+        self.installer.start()
+
+    def _on_installed(self, error: str):
+        self.record_btn.setEnabled(True)
+        if error:
+            QMessageBox.critical(self, "Error", f"Playwright install failed:\n{error}")
+            return
+        self._launch_codegen()
 
+    def _launch_codegen(self):
         out_dir = self.main.save_dir()
         os.makedirs(out_dir, exist_ok=True)
         browser = self.browser.currentText()
@@ -346,9 +624,9 @@ class ScriptsTab(QWidget):
         base = self.main.save_dir()
         if not os.path.isdir(base):
             return
-        for fname in sorted(os.listdir(base)):
-            if fname.endswith(".py"):
-                self.listw.addItem(QListWidgetItem(fname))
+        with os.scandir(base) as it:
+            names = sorted(e.name for e in it if e.name.endswith(".py") and e.is_file())
+        self.listw.addItems(names)
         self.main.log("Script list refreshed.")
 
     def play(self):
@@ -357,28 +635,21 @@ class ScriptsTab(QWidget):
             QMessageBox.warning(self, "No selection", "Select a script to play.")
             return
         script = os.path.join(self.main.save_dir(), item.text())
-        try:
-            with open(script, 'r', encoding="utf-8") as f:
-                code = f.read()
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to read script:\n{e}")
-            return
-
-        if not self.close_browser.isChecked():
-            code = re.sub(r"^[ \t]*browser\.close\(\)[ \t]*\n", "", code, flags=re.M)
-            temp = os.path.join(self.main.save_dir(), f"temp_{os.path.basename(script)}")
-            with open(temp, 'w', encoding="utf-8") as tf:
-                tf.write(code)
-            script_to_run = temp
-        else:
-            script_to_run = script
-
         env = os.environ.copy()
         env['PLAYWRIGHT_BROWSER'] = self.browser.currentText()
         env['HEADLESS'] = '1' if self.headless.isChecked() else '0'
-        subprocess.Popen([sys.executable, script_to_run], env=env)
-        self.main.log(f"Playing script: {os.path.basename(script_to_run)}")
-        QMessageBox.information(self, "Playing", os.path.basename(script_to_run))
+        if self.close_browser.isChecked():
+            subprocess.Popen([sys.executable, script], env=env)
+        else:
+            try:
+                with open(script, 'r', encoding="utf-8") as f:
+                    code = f.read()
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Failed to read script:\n{e}")
+                return
+            run_source(strip_browser_close(code), env)
+        self.main.log(f"Playing script: {os.path.basename(script)}")
+        QMessageBox.information(self, "Playing", os.path.basename(script))
 
 # --------------- Visual Flow Tab ----------------
 class FlowTab(QWidget):
@@ -386,6 +657,7 @@ class FlowTab(QWidget):
         super().__init__()
         self.main = main
         self.runner: Optional[FlowRunner] = None
+        self._rows: List[StepRow] = []  # mirrors steps_layout order (minus stretch)
 
         root = QVBoxLayout(self)
 
@@ -394,10 +666,12 @@ class FlowTab(QWidget):
         self.flow_name = QLineEdit(); self.flow_name.setPlaceholderText("Flow name (optional)")
         self.browser = QComboBox(); self.browser.addItems(["chromium", "firefox", "webkit"])
         self.headless = QCheckBox("Headless")
+        self.fast_shot = QCheckBox("Fast JPEG screenshots"); self.fast_shot.setToolTip("Chromium only: CDP JPEG capture instead of full PNG")
         self.per_step = QDoubleSpinBox(); self.per_step.setDecimals(2); self.per_step.setRange(0.0, 10000.0); self.per_step.setValue(0.0); self.per_step.setSuffix(" s")
         top.addWidget(QLabel("Name")); top.addWidget(self.flow_name, 1)
         top.addWidget(QLabel("Browser")); top.addWidget(self.browser)
         top.addWidget(self.headless)
+        top.addWidget(self.fast_shot)
         top.addWidget(QLabel("Per-step wait")); top.addWidget(self.per_step)
 
         # steps area (scroll)
@@ -438,32 +712,33 @@ class FlowTab(QWidget):
         row.move_down.connect(self.move_step_down)
         row.delete_me.connect(self.delete_step)
         # insert above the stretch (i.e., before last item)
-        self.steps_layout.insertWidget(self.steps_layout.count()-1, row)
+        self.steps_layout.insertWidget(len(self._rows), row)
+        self._rows.append(row)
+
+    def _swap_rows(self, idx: int):
+        # swap rows idx and idx+1 in both the list and the layout
+        rows = self._rows
+        rows[idx], rows[idx+1] = rows[idx+1], rows[idx]
+        self.steps_layout.removeWidget(rows[idx])
+        self.steps_layout.insertWidget(idx, rows[idx])
 
     def move_step_up(self, row: StepRow):
-        idx = self.steps_layout.indexOf(row)
+        idx = self._rows.index(row)
         if idx > 0:
-            self.steps_layout.removeWidget(row)
-            self.steps_layout.insertWidget(idx-1, row)
+            self._swap_rows(idx-1)
 
     def move_step_down(self, row: StepRow):
-        idx = self.steps_layout.indexOf(row)
-        # count includes the final stretch; last usable index is count-2
-        if 0 <= idx < self.steps_layout.count()-2:
-            self.steps_layout.removeWidget(row)
-            self.steps_layout.insertWidget(idx+1, row)
+        idx = self._rows.index(row)
+        if idx < len(self._rows)-1:
+            self._swap_rows(idx)
 
     def delete_step(self, row: StepRow):
+        self._rows.remove(row)
         row.setParent(None)
         row.deleteLater()
 
     def collect_flow(self) -> List[FlowStep]:
-        steps: List[FlowStep] = []
-        for i in range(self.steps_layout.count()-1):  # skip stretch
-            w = self.steps_layout.itemAt(i).widget()
-            if isinstance(w, StepRow):
-                steps.append(w.to_step())
-        return steps
+        return [r.to_step() for r in self._rows]
 
     def save_flow(self):
         steps = self.collect_flow()
@@ -474,14 +749,19 @@ class FlowTab(QWidget):
             "name": self.flow_name.text().strip() or datetime.datetime.now().strftime("flow_%Y%m%d_%H%M%S"),
             "browser": self.browser.currentText(),
             "headless": self.headless.isChecked(),
+            "fast_screenshot": self.fast_shot.isChecked(),
             "per_step_wait": float(self.per_step.value()),
-            "steps": [s.__dict__ for s in steps],
+            "steps": [asdict(s) for s in steps],
         }
         name = payload["name"] + ".json"
         path = os.path.join(flows_dir, name)
         try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(payload, f, indent=2)
+            tmp = path + ".tmp"  # atomic: a scheduler tick never reads a torn file
+            with open(tmp, "wb") as f:
+                f.write(_dumps(payload))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
             self.main.log(f"Flow saved: {path}")
             QMessageBox.information(self, "Saved", f"Flow saved to flows/{name}")
         except Exception as e:
@@ -492,16 +772,16 @@ class FlowTab(QWidget):
         if not path:
             return
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = read_flow_file(path)
             self.flow_name.setText(data.get("name",""))
             self.browser.setCurrentText(data.get("browser","chromium"))
             self.headless.setChecked(bool(data.get("headless", False)))
+            self.fast_shot.setChecked(bool(data.get("fast_screenshot", False)))
             self.per_step.setValue(float(data.get("per_step_wait", 0.0)))
             # clear current steps
-            for i in reversed(range(self.steps_layout.count()-1)):
-                w = self.steps_layout.itemAt(i).widget()
-                if w: w.setParent(None); w.deleteLater()
+            for r in self._rows:
+                r.setParent(None); r.deleteLater()
+            self._rows.clear()
             for s in data.get("steps", []):
                 self.add_step(FlowStep(**s))
             self.main.log(f"Flow loaded: {os.path.basename(path)}")
@@ -516,14 +796,19 @@ class FlowTab(QWidget):
         cfg = dict(
             browser=self.browser.currentText(),
             headless=self.headless.isChecked(),
+            fast_screenshot=self.fast_shot.isChecked(),
             per_step_wait=float(self.per_step.value()),
         )
         self.runner = FlowRunner(steps, cfg, self.main.save_dir())
-        self.runner.log_signal.connect(lambda m: self.main.log(m))
-        self.runner.done_signal.connect(lambda: self.main.log("Flow thread finished."))
+        # signals fire on the pool's loop thread; queue them straight into bound slots
+        self.runner.log_signal.connect(self.main.log, Qt.ConnectionType.QueuedConnection)
+        self.runner.done_signal.connect(self._on_done, Qt.ConnectionType.QueuedConnection)
         self.runner.start()
         self.main.log("Flow thread started.")
 
+    def _on_done(self):
+        self.main.log("Flow thread finished.")
+
 # --------------- Schedule Tab ----------------
 class ScheduleTab(QWidget):
     def __init__(self, main):
@@ -600,10 +885,8 @@ class ScheduleTab(QWidget):
         if not d or not t:
             return None
         try:
-            yy, mm, dd = [int(x) for x in d.split("-")]
-            hh, mi = [int(x) for x in t.split(":")]
-            return datetime.datetime(yy, mm, dd, hh, mi)
-        except Exception:
+            return _parse_dt(d, t)
+        except ValueError:
             return None
 
     def add_schedule(self):
@@ -641,17 +924,46 @@ class ScheduleTab(QWidget):
         self.list_box.setPlainText("\n".join(lines))
 
 # --------------- Main Window ----------------
+# colors live in the palette (_DARK_PALETTE); QSS only adds borders/padding and refers back to it
+_DARK_PALETTE = {
+    QPalette.ColorRole.Window: "#14161b",
+    QPalette.ColorRole.WindowText: "#eaeaea",
+    QPalette.ColorRole.Base: "#20232a",
+    QPalette.ColorRole.AlternateBase: "#1b1e24",
+    QPalette.ColorRole.Text: "#f0f0f0",
+    QPalette.ColorRole.Button: "#2b2f36",
+    QPalette.ColorRole.ButtonText: "#eaeaea",
+    QPalette.ColorRole.Midlight: "#353b45",
+    QPalette.ColorRole.Dark: "#232830",
+}
+_DARK_QSS = """
+QLineEdit, QPlainTextEdit, QListWidget, QComboBox, QSpinBox, QDoubleSpinBox {
+    background-color: palette(base); border: 1px solid #2e323a; padding: 3px;
+}
+QPushButton { background-color: palette(button); border: 1px solid #3a3f49; padding: 6px; }
+QPushButton:hover { background-color: palette(midlight); }
+QTabWidget::pane { border: 1px solid #2e323a; }
+QTabBar::tab { background: palette(alternate-base); padding: 8px 12px; border: 1px solid #2e323a; }
+QTabBar::tab:selected { background: palette(dark); }
+QLabel { color: #e0e0e0; }
+"""
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle(APP_TITLE)
         self.resize(1100, 720)
+        # log() only queues; lines are appended to log_box in one batch every 100 ms
+        # (created first so tabs can log while they're being built)
+        self._log_q = collections.deque()
 
         # Scheduler
         self.scheduler = Scheduler(self._run_scheduled_job)
         self.timer = QTimer(self)
-        self.timer.timeout.connect(self.scheduler.tick)
-        self.timer.start(1000)  # 1s
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.TimerType.CoarseTimer)
+        self.timer.timeout.connect(self._on_tick)
+        self._arm_scheduler_timer()
 
         # Top bar (save dir)
         topw = QWidget()
@@ -678,6 +990,10 @@ class MainWindow(QMainWindow):
         self.log_box = QPlainTextEdit()
         self.log_box.setReadOnly(True)
         self.log_box.setMinimumHeight(140)
+        self.log_box.setMaximumBlockCount(5000)
+        self._log_timer = QTimer(self)
+        self._log_timer.timeout.connect(self._flush_logs)
+        self._log_timer.start(100)
 
         # Layout
         central = QWidget()
@@ -691,19 +1007,14 @@ class MainWindow(QMainWindow):
         self._apply_dark_theme()
 
     def _apply_dark_theme(self):
-        # lightweight dark palette via stylesheet
-        self.setStyleSheet("""
-            QWidget { background-color: #14161b; color: #eaeaea; }
-            QLineEdit, QPlainTextEdit, QListWidget, QComboBox, QSpinBox, QDoubleSpinBox {
-                background-color: #20232a; color: #f0f0f0; border: 1px solid #2e323a; padding: 3px;
-            }
-            QPushButton { background-color: #2b2f36; border: 1px solid #3a3f49; padding: 6px; }
-            QPushButton:hover { background-color: #353b45; }
-            QTabWidget::pane { border: 1px solid #2e323a; }
-            QTabBar::tab { background: #1b1e24; padding: 8px 12px; border: 1px solid #2e323a; }
-            QTabBar::tab:selected { background: #232830; }
-            QLabel { color: #e0e0e0; }
-        """)
+        # app-wide so message boxes / file dialogs match; Fusion honors the palette (the native style doesn't)
+        app = QApplication.instance()
+        app.setStyle("Fusion")
+        pal = app.palette()
+        for role, color in _DARK_PALETTE.items():
+            pal.setColor(role, QColor(color))
+        app.setPalette(pal)
+        app.setStyleSheet(_DARK_QSS)
 
     def save_dir(self) -> str:
         return self.dir_line.text().strip() or default_dir
@@ -717,49 +1028,67 @@ class MainWindow(QMainWindow):
 
     # -------- Logging ----------
     def log(self, msg: str):
-        self.log_box.appendPlainText(f"[{now_str()}] {msg}")
-        self.log_box.moveCursor(self.log_box.textCursor().End)
+        self._log_q.append(f"[{now_str()}] {msg}")
+
+    def _flush_logs(self):
+        if not self._log_q:
+            return
+        batch = []
+        while self._log_q:
+            batch.append(self._log_q.popleft())
+        self.log_box.appendPlainText("\n".join(batch))
 
     # -------- Scheduler hook ----------
+    def _arm_scheduler_timer(self):
+        # wake on the next SCHED_TICK_S wall-clock boundary (+ a little slack) instead of every second
+        now = time.time()
+        delay = SCHED_TICK_S - (now % SCHED_TICK_S)
+        self.timer.start(int(delay * 1000) + 50)
+
+    def _on_tick(self):
+        self.scheduler.tick()
+        self._arm_scheduler_timer()
+
     def _run_scheduled_job(self, job: ScheduledJob):
         self.log(f"Running scheduled job #{job.job_id}…")
         if job.kind == "script":
             env = os.environ.copy()
             env['PLAYWRIGHT_BROWSER'] = job.browser
             env['HEADLESS'] = '1' if job.headless else '0'
-            target = job.path
             if not job.close_browser:
                 try:
                     with open(job.path, "r", encoding="utf-8") as f:
                         code = f.read()
-                    code = re.sub(r"^[ \t]*browser\.close\(\)[ \t]*\n", "", code, flags=re.M)
-                    temp = os.path.join(self.save_dir(), f"temp_{os.path.basename(job.path)}")
-                    with open(temp, "w", encoding="utf-8") as tf:
-                        tf.write(code)
-                    target = temp
+                    run_source(strip_browser_close(code), env)
+                    return
                 except Exception as e:
-                    self.log(f"Temp edit failed: {e}")
-            subprocess.Popen([sys.executable, target], env=env)
+                    self.log(f"Script edit failed: {e}")
+            subprocess.Popen([sys.executable, job.path], env=env)
         else:  # flow
             try:
-                with open(job.path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
+                data = read_flow_file(job.path)
                 steps = [FlowStep(**s) for s in data.get("steps", [])]
                 cfg = dict(
                     browser=job.browser or data.get("browser","chromium"),
                     headless=job.headless if job.headless is not None else data.get("headless", False),
                     per_step_wait=float(data.get("per_step_wait", 0.0)),
+                    fast_screenshot=bool(data.get("fast_screenshot", False)),
                 )
                 runner = FlowRunner(steps, cfg, self.save_dir())
-                runner.log_signal.connect(lambda m: self.log(m))
-                runner.done_signal.connect(lambda: self.log(f"Scheduled flow finished (#{job.job_id})."))
+                runner.log_signal.connect(self.log, Qt.ConnectionType.QueuedConnection)
+                runner.done_signal.connect(partial(self._on_scheduled_flow_done, job.job_id),
+                                           Qt.ConnectionType.QueuedConnection)
                 runner.start()
             except Exception as e:
                 self.log(f"Scheduled flow failed: {e}")
 
+    def _on_scheduled_flow_done(self, job_id: int):
+        self.log(f"Scheduled flow finished (#{job_id}).")
+
 # --------------- main ----------------
 def main():
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(_POOL.close)
     win = MainWindow()
     win.show()
     sys.exit(app.exec())
@@ -1,22 +1,31 @@
-# custom_cursor.py
-# Windows 10/11 • Python 3.10+ • PyQt6 + Pillow; optional SD-Turbo (DirectML) for textures
+# custom_cursor.py
+# Windows 10/11 • Python 3.10+ • PyQt6 + Pillow + numpy; optional SD-Turbo (DirectML) for textures
 # Key upgrades:
 #  - Reliable "Install & Apply (Current User)" using HKCU scheme + SPI_SETCURSORS with broadcast
 #  - True .cur frames (hotspots) -> .ani
 #  - Animated live preview
 #  - Randomize: color, path shape, tail len, frames, fps, seed
 #
-# Run: python custom_cursor.py
+# Run: python custom_cursor.py
 
-import os, sys, math, struct, time, random
-from dataclasses import dataclass
+import os, sys, struct, time, random, hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from dataclasses import dataclass, replace
 from typing import Optional, List, Tuple
 from io import BytesIO
 
+import numpy as np
 from PIL import Image, ImageDraw, ImageFilter
 from PyQt6 import QtCore, QtGui, QtWidgets
 from PyQt6.QtCore import Qt
 
+try:  # optional: pip install numba (native tail rasterizer)
+    from numba import njit
+except Exception:
+    njit = None
+
 # ------------------------ CUR / ANI writers ------------------------
 
 def cur_bytes_from_image(img: Image.Image, hotspot=(0,0)) -> bytes:
@@ -32,33 +41,42 @@ def cur_bytes_from_image(img: Image.Image, hotspot=(0,0)) -> bytes:
     return icondir + entry + png
 
 def write_ani_from_cur_frames(cur_frames: List[bytes], fps: int, out_path: str):
-    """Minimal RIFF ACON with CUR frames as 'icon' chunks."""
+    """Minimal RIFF ACON with CUR frames as 'icon' chunks, laid out in one preallocated buffer."""
     jif_rate = 60
     ticks = max(1, int(jif_rate / max(1, fps)))
     c = len(cur_frames)
     anih = struct.pack("<IIIIIIII", 36, c, c, 0, 0, 32, 1, jif_rate) + struct.pack("<I", 1)
-    chunks = [
-        b"anih"+struct.pack("<I", len(anih))+anih,
-        b"rate"+struct.pack("<I", 4*c)+b"".join(struct.pack("<I", ticks) for _ in range(c)),
-        b"seq "+struct.pack("<I", 4*c)+b"".join(struct.pack("<I", i) for i in range(c)),
-    ]
-    fram_payload = b""
+    fram_len = 4 + sum(8 + len(curb) + (len(curb) & 1) for curb in cur_frames)  # "fram" + icon chunks
+    riff_len = 4 + (8+len(anih)) + 2*(8+4*c) + (8+fram_len)                     # "ACON" + chunks
+    buf = bytearray(8 + riff_len)
+    struct.pack_into("<4sI4s", buf, 0, b"RIFF", riff_len, b"ACON"); off = 12
+    struct.pack_into("<4sI", buf, off, b"anih", len(anih)); off += 8
+    buf[off:off+len(anih)] = anih; off += len(anih)
+    struct.pack_into(f"<4sI{c}I", buf, off, b"rate", 4*c, *([ticks]*c)); off += 8+4*c
+    struct.pack_into(f"<4sI{c}I", buf, off, b"seq ", 4*c, *range(c)); off += 8+4*c
+    struct.pack_into("<4sI4s", buf, off, b"LIST", fram_len, b"fram"); off += 12
     for curb in cur_frames:
-        fram_payload += b"icon"+struct.pack("<I", len(curb))+curb
-        if len(curb) & 1: fram_payload += b"\x00"
-    fram = b"LIST"+struct.pack("<I", len(b"fram")+len(fram_payload))+b"fram"+fram_payload
-    payload = b"".join(chunks)+fram
-    riff = b"RIFF"+struct.pack("<I", len(b"ACON")+len(payload))+b"ACON"+payload
-    with open(out_path, "wb") as f: f.write(riff)
+        n = len(curb)
+        struct.pack_into("<4sI", buf, off, b"icon", n); off += 8
+        buf[off:off+n] = curb; off += n + (n & 1)  # odd chunks keep their zero pad byte
+    with open(out_path, "wb") as f: f.write(buf)
 
 # ------------------------ Optional AI texture ------------------------
 
+@lru_cache(maxsize=2)
+def _get_pipe(model_dir: str):
+    """Load SD-Turbo once per model dir; later texture requests reuse it from VRAM."""
+    import torch, torch_directml                    # type: ignore
+    from diffusers import AutoPipelineForText2Image  # type: ignore
+    pipe = AutoPipelineForText2Image.from_pretrained(model_dir, torch_dtype=torch.float16).to(torch_directml.device())
+    pipe.set_progress_bar_config(disable=True)
+    pipe.enable_attention_slicing()
+    pipe.unet.to(memory_format=torch.channels_last)
+    return pipe
+
 def try_make_ai_texture(prompt: str, model_dir: str, size=256) -> Optional[Image.Image]:
     try:
-        import torch, torch_directml                    # type: ignore
-        from diffusers import AutoPipelineForText2Image  # type: ignore
-        device = torch_directml.device()
-        pipe = AutoPipelineForText2Image.from_pretrained(model_dir, torch_dtype=torch.float16).to(device)
+        pipe = _get_pipe(os.path.realpath(model_dir))
         img = pipe(prompt, num_inference_steps=1, guidance_scale=0.0, width=size, height=size).images[0]
         return img.convert("RGBA")
     except Exception as e:
@@ -67,7 +85,7 @@ def try_make_ai_texture(prompt: str, model_dir: str, size=256) -> Optional[Image
 
 # ------------------------ Cursor synthesis ------------------------
 
-@dataclass
+@dataclass(frozen=True)
 class CursorParams:
     size: int = 64
     frames: int = 16
@@ -81,71 +99,169 @@ class CursorParams:
     ai_prompt: str = "glassy neon texture, soft glow"
     model_dir: str = r"C:\models\sd_turbo"
 
-def _path_xy(t: float, S: int, kind: str) -> Tuple[int,int]:
-    """Normalized parametric paths for the head."""
+def _path_xy(t: np.ndarray, S: int, kind: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Normalized parametric paths for the head, evaluated for all frame times at once."""
     if kind == "orbit":
-        x = 0.5 + 0.28*math.cos(2*math.pi*t)
-        y = 0.5 + 0.18*math.sin(2*math.pi*t*1.2)
+        x = 0.5 + 0.28*np.cos(2*np.pi*t)
+        y = 0.5 + 0.18*np.sin(2*np.pi*t*1.2)
     elif kind == "zigzag":
         # triangle wave horizontally, gentle sine vertically
-        tri = 2*abs(2*(t - math.floor(t+0.5)))  # 0..1..0
+        tri = 2*np.abs(2*(t - np.floor(t+0.5)))  # 0..1..0
         x = 0.2 + 0.6*tri
-        y = 0.5 + 0.1*math.sin(2*math.pi*t*3.0)
+        y = 0.5 + 0.1*np.sin(2*np.pi*t*3.0)
     elif kind == "swirl":
         r = 0.05 + 0.30*t
-        ang = 2*math.pi*1.75*t
-        x = 0.5 + r*math.cos(ang)
-        y = 0.5 + r*math.sin(ang)
+        ang = 2*np.pi*1.75*t
+        x = 0.5 + r*np.cos(ang)
+        y = 0.5 + r*np.sin(ang)
     else:  # comet (default): left->right gentle sine
         x = 0.25 + 0.5*t
-        y = 0.5 + 0.06*math.sin(2*math.pi*t)
-    return int(x*S), int(y*S)
-
-def make_frame(t: float, p: CursorParams, ai_tex: Optional[Image.Image], rng: random.Random) -> Image.Image:
+        y = 0.5 + 0.06*np.sin(2*np.pi*t)
+    return (x*S).astype(np.int32), (y*S).astype(np.int32)
+
+HEAD_R = 6
+GLOW_PAD = 4  # room around the head for the baked-in blur
+
+@lru_cache(maxsize=16)
+def _head_sprite(glow_color: Tuple[int,int,int], head_r: int = HEAD_R) -> Image.Image:
+    """Core + rim with its soft glow already applied; only the position changes per frame."""
+    c = head_r + GLOW_PAD
+    spr = Image.new("RGBA", (2*c+1, 2*c+1), (0,0,0,0))
+    d = ImageDraw.Draw(spr)
+    d.ellipse((c-4, c-4, c+4, c+4), fill=(255,255,255,220))
+    d.ellipse((c-head_r, c-head_r, c+head_r, c+head_r),
+              outline=(glow_color[0],glow_color[1],glow_color[2],160), width=2)
+    return Image.alpha_composite(spr.filter(ImageFilter.GaussianBlur(2)), spr)
+
+def _ai_patch(ai_tex: Image.Image, head_r: int = HEAD_R) -> Tuple[Image.Image, Image.Image]:
+    patch = ai_tex.resize((head_r*4, head_r*4), Image.LANCZOS)
+    mask = Image.new("L", patch.size, 0)
+    ImageDraw.Draw(mask).ellipse((0,0,patch.width-1,patch.height-1), fill=255)
+    return patch, mask
+
+@lru_cache(maxsize=8)
+def _dot_sprites(max_r: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Tail dot tiles for radii 0..max_r: the filled disk and its GaussianBlur(2) glow,
+    alpha in 0..1, each centred in a (2c+1)^2 tile."""
+    c = max_r + GLOW_PAD
+    n = 2*c + 1
+    hard = np.zeros((max_r+1, n, n), np.float32)
+    soft = np.zeros((max_r+1, n, n), np.float32)
+    for r in range(1, max_r+1):
+        tile = Image.new("L", (n, n), 0)
+        ImageDraw.Draw(tile).ellipse((c-r, c-r, c+r, c+r), fill=255)
+        hard[r] = np.asarray(tile, np.float32) / 255
+        soft[r] = np.asarray(tile.filter(ImageFilter.GaussianBlur(2)), np.float32) / 255
+    return hard, soft
+
+def _splat_tail_np(h: np.ndarray, g: np.ndarray, xs: np.ndarray, ys: np.ndarray, radii: np.ndarray,
+                   alphas: np.ndarray, hard: np.ndarray, soft: np.ndarray):
+    # dots in order, far -> near. Disks replace the alpha under them like ImageDraw.ellipse did,
+    # glows keep the max; the caller puts h over g. Within a few % of the old draw-then-blur.
+    S = h.shape[0]
+    c = hard.shape[1] // 2
+    for x, y, r, al in zip(xs.tolist(), ys.tolist(), radii.tolist(), alphas.tolist()):
+        x0, y0, x1, y1 = max(0, x-c), max(0, y-c), min(S, x+c+1), min(S, y+c+1)
+        if x0 >= x1 or y0 >= y1:
+            continue
+        win = h[y0:y1, x0:x1]
+        win[hard[r, y0-y+c:y1-y+c, x0-x+c:x1-x+c] > 0] = al
+        win = g[y0:y1, x0:x1]
+        np.maximum(win, al*soft[r, y0-y+c:y1-y+c, x0-x+c:x1-x+c], out=win)
+
+if njit is not None:
+    @njit(cache=True, fastmath=True, nogil=True)  # nogil: frames run on _FRAME_POOL threads
+    def _splat_tail(h, g, xs, ys, radii, alphas, hard, soft):
+        # same as _splat_tail_np, one pass per dot, no temporaries
+        S = h.shape[0]
+        c = hard.shape[1] // 2
+        for k in range(xs.shape[0]):
+            x, y, r, al = xs[k], ys[k], radii[k], alphas[k]
+            for py in range(max(0, y-c), min(S, y+c+1)):
+                ty = py - y + c
+                for px in range(max(0, x-c), min(S, x+c+1)):
+                    tx = px - x + c
+                    if hard[r, ty, tx] > 0:
+                        h[py, px] = al
+                    glow = al*soft[r, ty, tx]
+                    if glow > g[py, px]:
+                        g[py, px] = glow
+else:
+    _splat_tail = _splat_tail_np
+
+def _composite_at(img: Image.Image, spr: Image.Image, x: int, y: int):
+    """img.alpha_composite(spr, (x, y)), clipping the sprite at the frame edges."""
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(img.width, x+spr.width), min(img.height, y+spr.height)
+    if x0 < x1 and y0 < y1:
+        img.alpha_composite(spr.crop((x0-x, y0-y, x1-x, y1-y)), (x0, y0))
+
+def make_frame(cx: int, cy: int, p: CursorParams, ai_patch: Optional[Tuple[Image.Image, Image.Image]],
+               jitter: np.ndarray, hue_shift: int) -> Image.Image:
+    """jitter: (tail_len+1, 2) uniforms in [0,1); row 0 drives the frame, the rest the tail wander."""
     S = p.size
-    img = Image.new("RGBA", (S, S), (0,0,0,0))
-    d = ImageDraw.Draw(img)
-
-    cx, cy = _path_xy(t, S, p.path_kind)
 
     # jitter for "alive" feel
-    j = 0.4 + 0.6*rng.random()
-    tail_jit = int(1 + 1.8*rng.random())
-    hue_shift = rng.randint(-8, 8)
-
-    # tail dots (with slight wander)
-    for i in range(p.tail_len, 0, -1):
-        alpha = int(10 + 12*i*j)
-        r = max(1, int(i*0.8))
-        ox = int((i*3) + rng.uniform(-tail_jit, tail_jit))
-        oy = int(rng.uniform(-tail_jit, tail_jit))
-        col = (
-            max(0, min(255, p.glow_color[0] + hue_shift)),
-            max(0, min(255, p.glow_color[1] + hue_shift)),
-            max(0, min(255, p.glow_color[2] + hue_shift)),
-        )
-        d.ellipse((cx-ox-r, cy-oy-r, cx-ox+r, cy-oy+r), fill=(col[0],col[1],col[2],alpha))
-
-    # head: AI patch or plain glow
-    head_r = 6
-    if ai_tex and p.use_ai:
-        patch = ai_tex.resize((head_r*4, head_r*4), Image.LANCZOS)
-        mask = Image.new("L", patch.size, 0)
-        ImageDraw.Draw(mask).ellipse((0,0,patch.width-1,patch.height-1), fill=255)
-        img.paste(patch, (cx-head_r*2, cy-head_r*2), mask)
-
-    # core + rim
-    d.ellipse((cx-4, cy-4, cx+4, cy+4), fill=(255,255,255,220))
-    d.ellipse((cx-head_r, cy-head_r, cx+head_r, cy+head_r),
-              outline=(p.glow_color[0],p.glow_color[1],p.glow_color[2],160), width=2)
-
-    # soft glow
-    img = Image.alpha_composite(img.filter(ImageFilter.GaussianBlur(2)), img)
+    j = 0.4 + 0.6*float(jitter[0, 0])
+    tail_jit = int(1 + 1.8*jitter[0, 1])
+
+    # tail dots (with slight wander), far -> near
+    i = np.arange(p.tail_len, 0, -1)
+    wander = (2*jitter[1:] - 1) * tail_jit
+    alpha = np.minimum(255, (10 + 12*i*j).astype(np.int32)).astype(np.float32) / 255
+    r = np.maximum(1, (i*0.8).astype(np.int32))
+    ox = (i*3 + wander[:, 0]).astype(np.int32)  # astype truncates like int()
+    oy = wander[:, 1].astype(np.int32)
+    # dots come from pre-blurred tiles, so the frame itself is never blurred
+    hard, soft = _dot_sprites(int(r.max()))
+    h = np.zeros((S, S), np.float32)
+    g = np.zeros((S, S), np.float32)
+    _splat_tail(h, g, (cx-ox).astype(np.int32), (cy-oy).astype(np.int32), r, alpha, hard, soft)
+    a = h + g*(1 - h)  # sharp dots over their glow
+    arr = np.zeros((S, S, 4), np.uint8)
+    arr[a > 0, :3] = np.clip(np.array(p.glow_color) + hue_shift, 0, 255)
+    arr[..., 3] = (a*255 + 0.5).astype(np.uint8)
+    img = Image.fromarray(arr, "RGBA")
+
+    # head: AI patch, then the pre-blurred core + rim on top
+    if ai_patch:
+        patch, mask = ai_patch
+        img.paste(patch, (cx-HEAD_R*2, cy-HEAD_R*2), mask)
+    c = HEAD_R + GLOW_PAD
+    _composite_at(img, _head_sprite(p.glow_color), cx-c, cy-c)
     return img
 
+_FRAME_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="cursor-frame")
+
 def build_frames(p: CursorParams, ai_tex: Optional[Image.Image]) -> List[Image.Image]:
-    rng = random.Random(p.seed)
-    return [make_frame(i/p.frames, p, ai_tex, rng) for i in range(p.frames)]
+    # all of the regen's randomness in two calls instead of ~2*tail_len per frame
+    rng = np.random.default_rng(p.seed)
+    jitter = rng.random((p.frames, p.tail_len+1, 2), dtype=np.float32)
+    hue = rng.integers(-8, 9, size=p.frames).tolist()
+    cxs, cys = _path_xy(np.arange(p.frames)/p.frames, p.size, p.path_kind)
+    cxs, cys = cxs.tolist(), cys.tolist()
+    ai_patch = _ai_patch(ai_tex) if (ai_tex and p.use_ai) else None
+    # frames are independent (randomness is pre-drawn above) and Pillow/NumPy release the GIL
+    return list(_FRAME_POOL.map(lambda i: make_frame(cxs[i], cys[i], p, ai_patch, jitter[i], hue[i]), range(p.frames)))
+
+def frame_key(p: CursorParams, ai_key: Optional[str]) -> tuple:
+    """Everything that changes frame pixels; fps and hotspot only matter for playback/export."""
+    return (p.size, p.frames, p.tail_len, p.seed, p.path_kind, p.glow_color, ai_key)
+
+# frame_key -> frames; scrubbing a spinbox back and forth hits this
+_FRAME_CACHE: "OrderedDict[tuple, List[Image.Image]]" = OrderedDict()
+FRAME_CACHE_SIZE = 32
+
+def cached_frames(p: CursorParams, ai_tex: Optional[Image.Image], ai_key: Optional[str]) -> List[Image.Image]:
+    key = frame_key(p, ai_key if ai_tex is not None else None)
+    frames = _FRAME_CACHE.get(key)
+    if frames is None:
+        frames = _FRAME_CACHE[key] = build_frames(p, ai_tex)
+        if len(_FRAME_CACHE) > FRAME_CACHE_SIZE:
+            _FRAME_CACHE.popitem(last=False)
+    else:
+        _FRAME_CACHE.move_to_end(key)
+    return frames
 
 # ------------------------ GUI ------------------------
 
@@ -163,8 +279,12 @@ class CursorGUI(QtWidgets.QWidget):
         self.setWindowTitle("AI Cursor Designer (v2)")
         self.p = CursorParams()
         self.ai_tex: Optional[Image.Image] = None
+        self.ai_key: Optional[str] = None  # content hash of ai_tex, part of the frame cache key
         self.frames: List[Image.Image] = []
         self.frame_index = 0
+        self._last_regen_key: Optional[tuple] = None
+        # coalesce bursts of spinbox steps into one regen
+        self.regenTimer = QtCore.QTimer(self, singleShot=True, interval=50, timeout=self._regen_frames)
 
         self._ui()
         self._regen_frames()
@@ -252,24 +372,26 @@ class CursorGUI(QtWidgets.QWidget):
 
     # ---------- logic ----------
     def _params_changed(self, *_):
-        self.p.size = self.sizeSpin.value()
-        self.p.frames = self.framesSpin.value()
-        self.p.fps = self.fpsSpin.value()
-        self.p.hotspot = (self.hotxSpin.value(), self.hotySpin.value())
-        self.p.tail_len = self.tailSpin.value()
-        self.p.seed = self.seedSpin.value()
-        self.p.path_kind = self.pathBox.currentText()
+        self.p = replace(self.p,
+            size=self.sizeSpin.value(),
+            frames=self.framesSpin.value(),
+            fps=self.fpsSpin.value(),
+            hotspot=(self.hotxSpin.value(), self.hotySpin.value()),
+            tail_len=self.tailSpin.value(),
+            seed=self.seedSpin.value(),
+            path_kind=self.pathBox.currentText())
         self.animTimer.setInterval(int(1000/max(1,self.p.fps)))
-        self._regen_frames()
+        if frame_key(self.p, self._ai_key()) != self._last_regen_key:
+            self.regenTimer.start()
 
     def _pick_color(self):
         c = QtWidgets.QColorDialog.getColor(QtGui.QColor(*self.p.glow_color), self, "Glow color")
         if c.isValid():
-            self.p.glow_color = (c.red(), c.green(), c.blue())
+            self.p = replace(self.p, glow_color=(c.red(), c.green(), c.blue()))
             self._regen_frames()
 
     def _gen_ai(self):
-        self.p.use_ai = self.useAI.isChecked()
+        self.p = replace(self.p, use_ai=self.useAI.isChecked())
         if not self.p.use_ai:
             QtWidgets.QMessageBox.information(self, "AI off", "Enable 'Use AI texture' first."); return
         tex = try_make_ai_texture(self.aiPrompt.text().strip(), self.modelEdit.text().strip(), size=256)
@@ -277,6 +399,7 @@ class CursorGUI(QtWidgets.QWidget):
             QtWidgets.QMessageBox.warning(self, "AI failed", "Check model dir and dependencies.")
             return
         self.ai_tex = tex
+        self.ai_key = hashlib.blake2b(tex.tobytes(), digest_size=16).hexdigest()
         tex.save("cursor_ai_texture_preview.png")
         self._regen_frames()
 
@@ -293,11 +416,16 @@ class CursorGUI(QtWidgets.QWidget):
         col = (max(0,min(255,base)),
                max(0,min(255,base+off)),
                max(0,min(255,base-abs(off))))
-        self.p.glow_color = col
-        self._regen_frames()
+        self.p = replace(self.p, glow_color=col)
+        self.regenTimer.start()  # the spinbox changes above already queued one
+
+    def _ai_key(self) -> Optional[str]:
+        return self.ai_key if (self.p.use_ai and self.ai_tex) else None
 
     def _regen_frames(self):
-        self.frames = build_frames(self.p, self.ai_tex if (self.p.use_ai and self.ai_tex) else None)
+        ai_key = self._ai_key()
+        self.frames = cached_frames(self.p, self.ai_tex if ai_key else None, ai_key)
+        self._last_regen_key = frame_key(self.p, ai_key)
         self.frame_index = 0
         self._paint_preview()
 
@@ -1,13 +1,87 @@
-import requests
-import requests_cache
+import asyncio
+import aiohttp
+import torch
 from duckduckgo_search import ddg
-from newspaper import Article
+import trafilatura
 from transformers import pipeline
 from multiprocessing import Pool, cpu_count
-import functools
 
-# Initialize a requests cache (stores GET responses)
-requests_cache.install_cache('deep_research_cache', expire_after=3600)  # cache expires in 1 hour
+try:  # optional on-disk HTTP cache for the async fetcher
+    from aiohttp_client_cache import CachedSession, SQLiteBackend
+except ImportError:
+    CachedSession = None
+
+HTTP_CACHE = 'deep_research_http'  # sqlite file for cached GET responses
+CACHE_EXPIRE = 3600                 # cache expires in 1 hour
+FETCH_CONCURRENCY = 20
+FETCH_TIMEOUT = 15
+
+
+async def _fetch_all(urls):
+    """
+    Download all URLs concurrently on one event loop.
+    Returns the HTML for each URL in order ('' on failure).
+    """
+    sem = asyncio.Semaphore(FETCH_CONCURRENCY)
+    timeout = aiohttp.ClientTimeout(total=FETCH_TIMEOUT)
+    if CachedSession is not None:
+        session = CachedSession(cache=SQLiteBackend(HTTP_CACHE, expire_after=CACHE_EXPIRE), timeout=timeout)
+    else:
+        session = aiohttp.ClientSession(timeout=timeout)
+
+    async def fetch(url):
+        async with sem:
+            try:
+                async with session.get(url) as resp:
+                    resp.raise_for_status()
+                    return await resp.text(errors='replace')
+            except Exception as e:
+                print(f"Error fetching {url}: {e}")
+                return ''
+
+    async with session:
+        return await asyncio.gather(*(fetch(u) for u in urls))
+
+def _load_pipeline(task, model, cuda=None):
+    """
+    FP16 on CUDA; on CPU keep FP32 weights but int8-quantize the Linear layers.
+    """
+    if cuda is None:
+        cuda = torch.cuda.is_available()
+    pipe = pipeline(task, model=model, device=0 if cuda else -1,
+                    torch_dtype=torch.float16 if cuda else torch.float32)
+    pipe.model.eval()
+    if not cuda:
+        pipe.model = torch.quantization.quantize_dynamic(pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipe
+
+
+def _summarize_with(summarizer, text, max_length=150, min_length=40):
+    """
+    Summarize one article text; '' on failure. Inputs longer than the model's
+    limit are truncated, same as the batched path.
+    """
+    try:
+        with torch.inference_mode():
+            return summarizer(
+                text, truncation=True, max_length=max_length, min_length=min_length, do_sample=False
+            )[0]['summary_text']
+    except Exception as e:
+        print(f"Error summarizing: {e}")
+        return ''
+
+
+# Pool workers load the summarizer once in the initializer; tasks only ship text
+_summarizer = None
+
+def _init_worker(model_name):
+    global _summarizer
+    torch.set_num_threads(1)  # one core per worker, the pool provides the parallelism
+    _summarizer = _load_pipeline('summarization', model_name, cuda=False)
+
+def _worker_summarize(text):
+    return _summarize_with(_summarizer, text)
+
 
 class DeepResearchClone:
     def __init__(self,
@@ -18,9 +92,10 @@ class DeepResearchClone:
         # Initialize search settings
         self.search_engine = search_engine
         # Summarization pipeline
-        self.summarizer = pipeline('summarization', model=summarizer_model)
+        self.summarizer_model = summarizer_model
+        self.summarizer = _load_pipeline('summarization', summarizer_model)
         # QA pipeline
-        self.qa_pipeline = pipeline('question-answering', model=qa_model)
+        self.qa_pipeline = _load_pipeline('question-answering', qa_model)
         # Option to parallelize fetch+summarize
         self.use_multiprocessing = use_multiprocessing
 
@@ -31,54 +106,79 @@ class DeepResearchClone:
         results = ddg(query, max_results=max_results)
         return [r['href'] for r in results]
 
+    def extract_text(self, url, html):
+        """
+        Extract the main article text from already-downloaded HTML via trafilatura.
+        """
+        try:
+            return trafilatura.extract(html, url=url) or ''
+        except Exception as e:
+            print(f"Error parsing {url}: {e}")
+            return ''
+
+    def summarize(self, text, max_length=150, min_length=40):
+        """
+        Summarize one article text; '' on failure.
+        """
+        return _summarize_with(self.summarizer, text, max_length, min_length)
+
+    def summarize_batch(self, texts, max_length=150, min_length=40, batch_size=8):
+        """
+        Summarize many texts in one pipeline call (padded per batch).
+        Falls back to one-at-a-time if the batch fails.
+        """
+        if not texts:
+            return []
+        try:
+            with torch.inference_mode():
+                outs = self.summarizer(
+                    texts, batch_size=min(batch_size, len(texts)), truncation=True,
+                    max_length=max_length, min_length=min_length, do_sample=False
+                )
+            return [o['summary_text'] for o in outs]
+        except Exception as e:
+            print(f"Batch summarization failed ({e}), retrying one at a time")
+            return [self.summarize(t, max_length, min_length) for t in texts]
+
     def fetch_and_summarize(self, url, max_length=150, min_length=40):
         """
         Fetch page, parse text, and summarize.
         Returns a tuple (url, summary_text).
         """
-        try:
-            # Download and parse via newspaper3k
-            article = Article(url)
-            article.download()
-            article.parse()
-            text = article.text
-            if not text:
-                return (url, '')
-            # Summarize using transformer pipeline
-            summary = self.summarizer(
-                text, max_length=max_length, min_length=min_length, do_sample=False
-            )[0]['summary_text']
-            return (url, summary)
-        except Exception as e:
-            print(f"Error processing {url}: {e}")
+        html = asyncio.run(_fetch_all([url]))[0]
+        text = self.extract_text(url, html) if html else ''
+        if not text:
             return (url, '')
+        return (url, self.summarize(text, max_length, min_length))
 
     def research(self, query, question=None, max_results=5):
         # Search web
         urls = self.search(query, max_results)
         print(f"Found {len(urls)} URLs: {urls}")
 
-        # Fetch & summarize (optionally in parallel)
+        # Download everything concurrently; network I/O never touches the process pool
+        htmls = asyncio.run(_fetch_all(urls))
+        pages = [(url, self.extract_text(url, html)) for url, html in zip(urls, htmls) if html]
+        pages = [(url, text) for url, text in pages if text]
+
+        # Summarize: a CPU process pool if requested, else one batched call (always on CUDA)
         summaries = {}
-        if self.use_multiprocessing:
-            workers = max(1, cpu_count() - 1)
-            with Pool(workers) as pool:
-                func = functools.partial(self.fetch_and_summarize)
-                for url, summary in pool.map(func, urls):
-                    if summary:
-                        summaries[url] = summary
-                        print(f"-- Summary for {url}:\n{summary}\n")
+        if self.use_multiprocessing and pages and not torch.cuda.is_available():
+            workers = max(1, min(len(pages), cpu_count() - 1))
+            with Pool(workers, initializer=_init_worker, initargs=(self.summarizer_model,)) as pool:
+                results = pool.map(_worker_summarize, [text for _, text in pages])
         else:
-            for url in urls:
-                url, summary = self.fetch_and_summarize(url)
-                if summary:
-                    summaries[url] = summary
-                    print(f"-- Summary for {url}:\n{summary}\n")
+            results = self.summarize_batch([text for _, text in pages])
+        for (url, _), summary in zip(pages, results):
+            if summary:
+                summaries[url] = summary
+                print(f"-- Summary for {url}:\n{summary}\n")
 
         # Answer a question if provided
         if question and summaries:
             combined_context = ' '.join(summaries.values())
-            answer = self.qa_pipeline(question=question, context=combined_context)['answer']
+            with torch.inference_mode():
+                answer = self.qa_pipeline(question=question, context=combined_context)['answer']
             print(f"Answer: {answer}")
             return summaries, answer
         return summaries
@@ -1,37 +1,73 @@
+import os
+import base64
+import hashlib
 import subprocess
-import shlex
 import torch
 from transformers import AutoModelForCausalLM, AutoTokenizer
 
+try:  # optional: pip install diskcache (repeat requests skip the model entirely)
+    import diskcache
+except ImportError:
+    diskcache = None
+
+CACHE_DIR = os.path.expanduser('~/.ps_agent_cache')
+
+# Static prompt around the user request; the request is appended as " <request>"
+# so BPE merges its leading space the same way it would in the full string
+PROMPT_HEAD = "# Convert the following user request into a PowerShell script\n# User request:"
+PROMPT_TAIL = "\n# PowerShell script:\n"
+
 class PowerShellAgent:
     def __init__(self, model_name: str = 'gpt2', device: str = 'cpu'):
         # Load tokenizer and model
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(model_name).to(device)
+        # FP16 halves weight traffic on GPU; CPU kernels stay FP32
+        dtype = torch.float16 if 'cuda' in device else torch.float32
+        self.model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=dtype).to(device).eval()
         self.device = device
+        self.model_name = model_name
+        # Scripts the user confirmed, keyed by (model, max_length, request)
+        self._cache = diskcache.Cache(CACHE_DIR) if diskcache is not None else {}
+        # Tokenize the static prompt parts once; only the request is tokenized per call
+        self._head_ids = self.tokenizer(PROMPT_HEAD, return_tensors='pt').input_ids.to(device)
+        self._tail_ids = self.tokenizer(PROMPT_TAIL, return_tensors='pt', add_special_tokens=False).input_ids.to(device)
+
+    def _cache_key(self, user_request: str, max_length: int) -> str:
+        return hashlib.blake2b(f"{self.model_name}|{max_length}|{user_request}".encode('utf-8')).hexdigest()
 
-    def generate_powershell(self, user_request: str, max_length: int = 200) -> str:
+    def remember(self, user_request: str, script: str, max_length: int = 200):
+        self._cache[self._cache_key(user_request, max_length)] = script
+
+    def forget(self, user_request: str, max_length: int = 200):
+        self._cache.pop(self._cache_key(user_request, max_length), None)
+
+    @torch.inference_mode()
+    def generate_powershell(self, user_request: str, max_length: int = 200, use_cache: bool = True) -> str:
         """
         Generate a PowerShell script snippet based on the user request using model.generate(),
         avoiding the pipeline to prevent extra sklearn/numpy imports.
+        Returns a previously confirmed script for the same request unless use_cache is False;
+        fresh generations are not cached until remember() is called.
         """
-        prompt = (
-            "# Convert the following user request into a PowerShell script\n"
-            f"# User request: {user_request}\n"
-            "# PowerShell script:\n"
-        )
-        inputs = self.tokenizer(prompt, return_tensors='pt').to(self.device)
+        if use_cache:
+            cached = self._cache.get(self._cache_key(user_request, max_length))
+            if cached is not None:
+                return cached
+        req_ids = self.tokenizer(' ' + user_request, return_tensors='pt', add_special_tokens=False).input_ids.to(self.device)
+        input_ids = torch.cat([self._head_ids, req_ids, self._tail_ids], dim=1)
         outputs = self.model.generate(
-            **inputs,
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
             max_new_tokens=max_length,
+            use_cache=True,
+            num_beams=1,
             do_sample=True,
             top_p=0.95,
             temperature=0.7,
             pad_token_id=self.tokenizer.eos_token_id
         )
-        generated = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        # Extract only the script portion
-        return generated[len(prompt):].strip()
+        # Decode only the new tokens (the script portion)
+        return self.tokenizer.decode(outputs[0, input_ids.shape[1]:], skip_special_tokens=True).strip()
 
     def confirm_execution(self, script: str) -> bool:
         print("\nGenerated PowerShell script:")
@@ -42,28 +78,30 @@ class PowerShellAgent:
         return choice in ['yes', 'y']
 
     def execute_script(self, script: str) -> subprocess.CompletedProcess:
-        temp_file = 'temp_script.ps1'
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            f.write(script)
-        command = f"powershell -ExecutionPolicy Bypass -File {temp_file}"
-        result = subprocess.run(
-            shlex.split(command),
-            capture_output=True,
-            text=True
-        )
-        return result
+        # Script is passed as -EncodedCommand (UTF-16LE base64): no temp .ps1 on disk, no profile load,
+        # and unlike "-Command -" over stdin it is parsed as one script, not line by line.
+        # There is no script file, so $PSScriptRoot/$PSCommandPath are empty.
+        base = ['powershell', '-NoProfile', '-NonInteractive', '-ExecutionPolicy', 'Bypass']
+        encoded = base64.b64encode(script.encode('utf-16-le')).decode('ascii')
+        if len(encoded) < 30000:  # Windows command lines cap at 32767 chars
+            return subprocess.run(base + ['-EncodedCommand', encoded], capture_output=True, text=True)
+        # Too long for the command line: stdin is read interactively, so a trailing
+        # blank line is needed to flush a final multi-line statement
+        return subprocess.run(base + ['-Command', '-'], input=script + '\n\n', capture_output=True, text=True)
 
-    def handle_request(self, user_request: str):
+    def handle_request(self, user_request: str, refresh: bool = False):
         try:
-            script = self.generate_powershell(user_request)
+            script = self.generate_powershell(user_request, use_cache=not refresh)
         except ImportError as e:
             print("Error generating script: numpy/transformers version mismatch detected.")
             print("Please install a compatible numpy (<2.0) or rebuild affected modules.")
             return
 
         if not self.confirm_execution(script):
+            self.forget(user_request)  # a rejected script is never served again
             print("Execution canceled by user.")
             return
+        self.remember(user_request, script)
 
         result = self.execute_script(script)
         print(f"\nReturn code: {result.returncode}")
@@ -76,9 +114,10 @@ def main():
     model_name = input("Enter model name (default 'gpt2'): ").strip() or 'gpt2'
     device = input("Enter device ('cpu' or GPU index, e.g. 'cuda:0'): ").strip() or 'cpu'
     user_request = input("\nDescribe the Windows task to automate: ").strip()
+    refresh = input("Ignore previously confirmed script for this request? (yes/no): ").strip().lower() in ['yes', 'y']
 
     agent = PowerShellAgent(model_name=model_name, device=device)
-    agent.handle_request(user_request)
+    agent.handle_request(user_request, refresh=refresh)
 
 if __name__ == "__main__":
     main()
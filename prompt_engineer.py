@@ -1,355 +1,301 @@
-# prompt_engineer.py
+# prompt_engineer.py
 # Requires: PyQt6  (pip install PyQt6)
 # Python 3.9+
 
 from __future__ import annotations
+import heapq
 import json
 import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
 
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QAction, QIcon, QPalette, QColor
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QTextEdit, QLabel, QPushButton, QCheckBox, QFileDialog, QGroupBox,
     QGridLayout, QMessageBox, QStatusBar, QScrollArea, QLineEdit,
-    QComboBox
+    QComboBox, QButtonGroup
 )
 
 # ------------------------------------------------------------
-# Original helpers (kept verbatim to preserve behavior/wording)
+# Prompt snippets (key -> text; wording kept verbatim)
 # ------------------------------------------------------------
 
-def add_thinking(string=''):
-    return string + 'Show all your steps and your thinking process'
-
-def show_me_your_skills(string=''):
-    return string + 'Show all you calculations'
-
-def more_details(string=''):
-    return string + 'Be as detailed as possible'
-
-def self_critique(string=''):
-    return string + "In the end, critique your answer and improve it"
-
-def shadow_clones(string=''):
-    return string + "Generate three different answers and pick the best."
-
-def expertize(string=''):
-    return 'you are an expert in the question that will be asked.  ' + string
-
-def presioning(string=''):
-    return string + 'Be precise and avoid making assumptions.'
-
-def do_not_lie(string=''):
-    return string + 'Do not tell information you do not know. If there is something you do not know about the question, clearly say it to the user'
-
-def trasparency(string=''):
-    return string + 'Clearly state any limitations or areas of uncertainty'
-
-
-# ------------------------------------------------------------
-# Previously added helpers (appenders & prependers)
-# ------------------------------------------------------------
-
-def format_json(string=''):
-    return string + 'Format the final answer as a JSON object with clear keys and no extra prose.'
-
-def cite_sources(string=''):
-    return string + 'Cite all sources with links and a one-line justification for each.'
-
-def ask_questions_first(string=''):
-    return string + 'Before answering, ask any clarifying questions needed; if none are needed, proceed.'
-
-def list_assumptions(string=''):
-    return string + 'List any assumptions you had to make to answer.'
-
-def edge_cases(string=''):
-    return string + 'Consider edge cases and explain how they impact the solution.'
-
-def provide_examples(string=''):
-    return string + 'Include at least two concrete, realistic examples.'
-
-def outline_then_answer(string=''):
-    return string + 'First provide a short outline of your plan, then deliver the full answer.'
-
-def alternatives_and_tradeoffs(string=''):
-    return string + 'Propose at least two alternative approaches and compare their trade-offs.'
-
-def time_awareness(string=''):
-    return string + 'State the current date and time zone you assume, and note any time-sensitive caveats.'
-
-def rubric_self_eval(string=''):
-    return string + 'At the end, evaluate your answer against a brief rubric and score each criterion from 1–5.'
-
-def action_items(string=''):
-    return string + 'Finish with a numbered list of next actions a user can take.'
-
-def constraints_first(string=''):
-    return string + 'Begin by explicitly listing constraints, requirements, and non-goals.'
-
-def definitions_glossary(string=''):
-    return string + 'Define key terms in a short glossary before proceeding.'
-
-def test_plan(string=''):
-    return string + 'Provide a lightweight test/validation plan to verify the solution works as intended.'
-
-def technical_writer_persona(string=''):
-    return 'You are a meticulous technical writer who communicates clearly and concisely. ' + string
-
-
-# ------------------------------------------------------------
-# NEW: extra roles + new categories (more options)
-# ------------------------------------------------------------
-
-# Roles / personas (prepend)
-def socratic_tutor(string=''):
-    return 'You are a Socratic tutor who guides with questions and short hints. ' + string
-
-def product_manager(string=''):
-    return 'You are a pragmatic product manager focused on user impact, scope, and trade-offs. ' + string
-
-def data_scientist(string=''):
-    return 'You are a data scientist skilled in statistics and experiment design. ' + string
-
-def software_architect(string=''):
-    return 'You are a seasoned software architect emphasizing modular design and scalability. ' + string
-
-def security_auditor(string=''):
-    return 'You are a security auditor identifying risks and mitigations. ' + string
-
-def copywriter_persona(string=''):
-    return 'You are a persuasive copywriter who writes clearly and concisely. ' + string
-
-def ux_researcher(string=''):
-    return 'You are a UX researcher focusing on user needs and usability. ' + string
-
-def teacher_grade5(string=''):
-    return 'You are a patient teacher explaining concepts to a 5th-grade student. ' + string
-
-def legal_analyst_disclaimer(string=''):
-    return 'You are a legal analyst providing educational information (not legal advice). ' + string
-
-def sre_devops(string=''):
-    return 'You are an SRE/DevOps engineer focusing on reliability and observability. ' + string
-
-def data_engineer(string=''):
-    return 'You are a data engineer optimizing reliable data pipelines and schemas. ' + string
-
-def financial_analyst_disclaimer(string=''):
-    return 'You are a financial analyst providing educational information (not financial advice). ' + string
-
-def game_designer(string=''):
-    return 'You are a game designer focusing on mechanics, balance, and player motivation. ' + string
-
-def math_coach(string=''):
-    return 'You are a math coach who explains step-by-step and checks understanding. ' + string
-
-def interviewer(string=''):
-    return 'You are an interviewer who asks probing, structured questions. ' + string
-
-
-# Audience & context (prepend)
-def audience_beginner(string=''):
-    return 'Assume the audience are beginners with no prior knowledge. ' + string
-
-def audience_advanced(string=''):
-    return 'Assume the audience is advanced and prefers concise technical depth. ' + string
-
-def audience_executive(string=''):
-    return 'Assume an executive audience; prioritize outcomes, risks, and next steps. ' + string
-
-def audience_global(string=''):
-    return 'Write for a global audience and avoid region-specific jargon. ' + string
-
-def audience_plain_english(string=''):
-    return 'Use simple, plain English suitable for non-native readers. ' + string
-
-
-# Tone & style (append)
-def tone_concise_bullets(string=''):
-    return string + 'Answer concisely using bullet points.'
-
-def tone_friendly(string=''):
-    return string + 'Use a friendly, supportive tone.'
-
-def tone_academic(string=''):
-    return string + 'Use a formal, academic tone with citations where appropriate.'
-
-def tone_professional(string=''):
-    return string + 'Use a neutral, professional tone.'
-
-def tone_numbered_steps(string=''):
-    return string + 'Organize the answer as numbered steps.'
-
-def tone_confident(string=''):
-    return string + 'Adopt a confident and assertive tone while remaining factual.'
-
-
-# Output & structure (append)
-def tldr_first(string=''):
-    return string + 'Start with a 2–3 sentence TL;DR summary, then provide details.'
-
-def markdown_table(string=''):
-    return string + 'Include a concise Markdown table summarizing key points.'
-
-def section_headers(string=''):
-    return string + 'Use clear section headers: Overview, Approach, Examples, Caveats, Next Steps.'
-
-def faq_section(string=''):
-    return string + 'End with a short FAQ section with 3–5 Q&A pairs.'
-
-def star_format(string=''):
-    return string + 'When describing experiences, use the STAR format (Situation, Task, Action, Result).'
-
-def mece_structure(string=''):
-    return string + 'Organize points using a MECE structure (mutually exclusive, collectively exhaustive).'
-
-
-# Safety & QA (append)
-def bias_check(string=''):
-    return string + 'Identify potential biases or blind spots and note how you mitigated them.'
-
-def risk_register(string=''):
-    return string + 'List key risks and mitigation strategies.'
-
-def security_considerations(string=''):
-    return string + 'Include security considerations and safe usage guidelines.'
-
-def license_note(string=''):
-    return string + 'When including code or data, note relevant licenses if known.'
-
-
-# Code & data requirements (append)
-def runnable_code_snippet(string=''):
-    return string + 'Include a minimal runnable code snippet with inline comments.'
-
-def pseudocode_first(string=''):
-    return string + 'Before code, give short pseudocode.'
-
-def complexity_analysis(string=''):
-    return string + 'Include time and space complexity where applicable.'
-
-def unit_tests(string=''):
-    return string + 'Provide simple unit test examples or test cases.'
-
-def data_schema(string=''):
-    return string + 'If data is involved, include a minimal schema and field descriptions.'
+PREPEND_SNIPPETS = {
+    # Roles / personas
+    "role_expert": "you are an expert in the question that will be asked.",
+    "role_tech_writer": "You are a meticulous technical writer who communicates clearly and concisely.",
+    "role_socratic": "You are a Socratic tutor who guides with questions and short hints.",
+    "role_pm": "You are a pragmatic product manager focused on user impact, scope, and trade-offs.",
+    "role_ds": "You are a data scientist skilled in statistics and experiment design.",
+    "role_arch": "You are a seasoned software architect emphasizing modular design and scalability.",
+    "role_sec": "You are a security auditor identifying risks and mitigations.",
+    "role_copy": "You are a persuasive copywriter who writes clearly and concisely.",
+    "role_ux": "You are a UX researcher focusing on user needs and usability.",
+    "role_teacher": "You are a patient teacher explaining concepts to a 5th-grade student.",
+    "role_legal": "You are a legal analyst providing educational information (not legal advice).",
+    "role_sre": "You are an SRE/DevOps engineer focusing on reliability and observability.",
+    "role_de": "You are a data engineer optimizing reliable data pipelines and schemas.",
+    "role_fa": "You are a financial analyst providing educational information (not financial advice).",
+    "role_gd": "You are a game designer focusing on mechanics, balance, and player motivation.",
+    "role_math": "You are a math coach who explains step-by-step and checks understanding.",
+    "role_interviewer": "You are an interviewer who asks probing, structured questions.",
+
+    # Audience & context
+    "aud_beg": "Assume the audience are beginners with no prior knowledge.",
+    "aud_adv": "Assume the audience is advanced and prefers concise technical depth.",
+    "aud_exec": "Assume an executive audience; prioritize outcomes, risks, and next steps.",
+    "aud_global": "Write for a global audience and avoid region-specific jargon.",
+    "aud_plain": "Use simple, plain English suitable for non-native readers.",
+}
+
+APPEND_SNIPPETS = {
+    # Augmentations
+    "aug_think": "Show all your steps and your thinking process",
+    "aug_calc": "Show all you calculations",
+    "aug_more": "Be as detailed as possible",
+    "aug_crit": "In the end, critique your answer and improve it",
+    "aug_clones": "Generate three different answers and pick the best.",
+    "aug_prec": "Be precise and avoid making assumptions.",
+    "aug_truth": "Do not tell information you do not know. If there is something you do not know about the question, clearly say it to the user",
+    "aug_transp": "Clearly state any limitations or areas of uncertainty",
+    "aug_json": "Format the final answer as a JSON object with clear keys and no extra prose.",
+    "aug_cite": "Cite all sources with links and a one-line justification for each.",
+    "aug_ask": "Before answering, ask any clarifying questions needed; if none are needed, proceed.",
+    "aug_assume": "List any assumptions you had to make to answer.",
+    "aug_edge": "Consider edge cases and explain how they impact the solution.",
+    "aug_examples": "Include at least two concrete, realistic examples.",
+    "aug_outline": "First provide a short outline of your plan, then deliver the full answer.",
+    "aug_alts": "Propose at least two alternative approaches and compare their trade-offs.",
+    "aug_time": "State the current date and time zone you assume, and note any time-sensitive caveats.",
+    "aug_rubric": "At the end, evaluate your answer against a brief rubric and score each criterion from 1–5.",
+    "aug_actions": "Finish with a numbered list of next actions a user can take.",
+    "aug_constraints": "Begin by explicitly listing constraints, requirements, and non-goals.",
+    "aug_glossary": "Define key terms in a short glossary before proceeding.",
+    "aug_test": "Provide a lightweight test/validation plan to verify the solution works as intended.",
+
+    # Tone & style
+    "tone_bullets": "Answer concisely using bullet points.",
+    "tone_friendly": "Use a friendly, supportive tone.",
+    "tone_acad": "Use a formal, academic tone with citations where appropriate.",
+    "tone_prof": "Use a neutral, professional tone.",
+    "tone_steps": "Organize the answer as numbered steps.",
+    "tone_conf": "Adopt a confident and assertive tone while remaining factual.",
+
+    # Output & structure
+    "out_tldr": "Start with a 2–3 sentence TL;DR summary, then provide details.",
+    "out_table": "Include a concise Markdown table summarizing key points.",
+    "out_headers": "Use clear section headers: Overview, Approach, Examples, Caveats, Next Steps.",
+    "out_faq": "End with a short FAQ section with 3–5 Q&A pairs.",
+    "out_star": "When describing experiences, use the STAR format (Situation, Task, Action, Result).",
+    "out_mece": "Organize points using a MECE structure (mutually exclusive, collectively exhaustive).",
+
+    # Safety & QA
+    "qa_bias": "Identify potential biases or blind spots and note how you mitigated them.",
+    "qa_risks": "List key risks and mitigation strategies.",
+    "qa_sec": "Include security considerations and safe usage guidelines.",
+    "qa_license": "When including code or data, note relevant licenses if known.",
+
+    # Code & data requirements
+    "code_run": "Include a minimal runnable code snippet with inline comments.",
+    "code_pseudo": "Before code, give short pseudocode.",
+    "code_complex": "Include time and space complexity where applicable.",
+    "code_tests": "Provide simple unit test examples or test cases.",
+    "code_schema": "If data is involved, include a minimal schema and field descriptions.",
+}
 
 
 # ------------------------------------------------------------
-# Option registries (key, label, func, tooltip)
+# Option registries (key, label, tooltip)
 # ------------------------------------------------------------
 
 ROLES = [
-    ("role_expert", "Expert role", expertize, "Prepend: 'you are an expert in the question that will be asked.'"),
-    ("role_tech_writer", "Technical writer", technical_writer_persona, "Prepend: meticulous technical writer persona"),
-    ("role_socratic", "Socratic tutor", socratic_tutor, "Prepend: guides with questions and hints"),
-    ("role_pm", "Product manager", product_manager, "Prepend: user impact, scope, trade-offs"),
-    ("role_ds", "Data scientist", data_scientist, "Prepend: statistics & experiment design"),
-    ("role_arch", "Software architect", software_architect, "Prepend: modularity & scalability"),
-    ("role_sec", "Security auditor", security_auditor, "Prepend: risks & mitigations"),
-    ("role_copy", "Copywriter", copywriter_persona, "Prepend: persuasive, concise messaging"),
-    ("role_ux", "UX researcher", ux_researcher, "Prepend: user needs & usability"),
-    ("role_teacher", "Teacher (5th grade)", teacher_grade5, "Prepend: explain for a 5th grader"),
-    ("role_legal", "Legal analyst (educational)", legal_analyst_disclaimer, "Prepend: not legal advice"),
-    ("role_sre", "SRE/DevOps", sre_devops, "Prepend: reliability & observability"),
-    ("role_de", "Data engineer", data_engineer, "Prepend: data pipelines & schemas"),
-    ("role_fa", "Financial analyst (educational)", financial_analyst_disclaimer, "Prepend: not financial advice"),
-    ("role_gd", "Game designer", game_designer, "Prepend: mechanics & player motivation"),
-    ("role_math", "Math coach", math_coach, "Prepend: step-by-step explanations"),
-    ("role_interviewer", "Interviewer", interviewer, "Prepend: asks probing, structured questions"),
+    ("role_expert", "Expert role", "Prepend: 'you are an expert in the question that will be asked.'"),
+    ("role_tech_writer", "Technical writer", "Prepend: meticulous technical writer persona"),
+    ("role_socratic", "Socratic tutor", "Prepend: guides with questions and hints"),
+    ("role_pm", "Product manager", "Prepend: user impact, scope, trade-offs"),
+    ("role_ds", "Data scientist", "Prepend: statistics & experiment design"),
+    ("role_arch", "Software architect", "Prepend: modularity & scalability"),
+    ("role_sec", "Security auditor", "Prepend: risks & mitigations"),
+    ("role_copy", "Copywriter", "Prepend: persuasive, concise messaging"),
+    ("role_ux", "UX researcher", "Prepend: user needs & usability"),
+    ("role_teacher", "Teacher (5th grade)", "Prepend: explain for a 5th grader"),
+    ("role_legal", "Legal analyst (educational)", "Prepend: not legal advice"),
+    ("role_sre", "SRE/DevOps", "Prepend: reliability & observability"),
+    ("role_de", "Data engineer", "Prepend: data pipelines & schemas"),
+    ("role_fa", "Financial analyst (educational)", "Prepend: not financial advice"),
+    ("role_gd", "Game designer", "Prepend: mechanics & player motivation"),
+    ("role_math", "Math coach", "Prepend: step-by-step explanations"),
+    ("role_interviewer", "Interviewer", "Prepend: asks probing, structured questions"),
 ]
 
 AUDIENCE = [
-    ("aud_beg", "Beginner audience", audience_beginner, "Prepend: assume no prior knowledge"),
-    ("aud_adv", "Advanced audience", audience_advanced, "Prepend: concise, technical depth"),
-    ("aud_exec", "Executive audience", audience_executive, "Prepend: outcomes, risks, next steps"),
-    ("aud_global", "Global audience", audience_global, "Prepend: avoid region-specific jargon"),
-    ("aud_plain", "Plain English", audience_plain_english, "Prepend: simple, accessible language"),
+    ("aud_beg", "Beginner audience", "Prepend: assume no prior knowledge"),
+    ("aud_adv", "Advanced audience", "Prepend: concise, technical depth"),
+    ("aud_exec", "Executive audience", "Prepend: outcomes, risks, next steps"),
+    ("aud_global", "Global audience", "Prepend: avoid region-specific jargon"),
+    ("aud_plain", "Plain English", "Prepend: simple, accessible language"),
 ]
 
 AUGMENTATIONS = [
-    ("aug_think", "Add thinking (step-by-step)", add_thinking, "Append: 'Show all your steps...'"),
-    ("aug_calc", "Show calculations", show_me_your_skills, "Append: 'Show all you calculations'"),
-    ("aug_more", "More details", more_details, "Append: 'Be as detailed as possible'"),
-    ("aug_crit", "Self-critique", self_critique, "Append: 'In the end, critique your answer...'"),
-    ("aug_clones", "Shadow clones (3 answers, pick best)", shadow_clones, "Append: 'Generate three different answers...'"),
-    ("aug_prec", "Precision (avoid assumptions)", presioning, "Append: 'Be precise and avoid making assumptions.'"),
-    ("aug_truth", "Do not lie / admit uncertainty", do_not_lie, "Append: 'Do not tell information you do not know...'"),
-    ("aug_transp", "Transparency", trasparency, "Append: 'Clearly state any limitations or areas of uncertainty'"),
-    ("aug_json", "JSON output format", format_json, "Append: format result as JSON object"),
-    ("aug_cite", "Cite sources w/ links", cite_sources, "Append: cite sources + 1-line justification"),
-    ("aug_ask", "Ask clarifying Qs first", ask_questions_first, "Append: ask clarifying questions first"),
-    ("aug_assume", "List assumptions", list_assumptions, "Append: list any assumptions"),
-    ("aug_edge", "Edge cases", edge_cases, "Append: consider edge cases"),
-    ("aug_examples", "Provide examples", provide_examples, "Append: include at least two examples"),
-    ("aug_outline", "Outline then answer", outline_then_answer, "Append: outline first, then full answer"),
-    ("aug_alts", "Alternatives & trade-offs", alternatives_and_tradeoffs, "Append: propose alternatives & compare"),
-    ("aug_time", "Time awareness", time_awareness, "Append: state current date/timezone assumptions"),
-    ("aug_rubric", "Rubric self-eval", rubric_self_eval, "Append: evaluate your answer with a rubric"),
-    ("aug_actions", "Actionable next steps", action_items, "Append: numbered next actions"),
-    ("aug_constraints", "Constraints & non-goals first", constraints_first, "Append: list constraints and non-goals"),
-    ("aug_glossary", "Definitions glossary", definitions_glossary, "Append: short glossary of key terms"),
-    ("aug_test", "Test/validation plan", test_plan, "Append: lightweight test/validation plan"),
+    ("aug_think", "Add thinking (step-by-step)", "Append: 'Show all your steps...'"),
+    ("aug_calc", "Show calculations", "Append: 'Show all you calculations'"),
+    ("aug_more", "More details", "Append: 'Be as detailed as possible'"),
+    ("aug_crit", "Self-critique", "Append: 'In the end, critique your answer...'"),
+    ("aug_clones", "Shadow clones (3 answers, pick best)", "Append: 'Generate three different answers...'"),
+    ("aug_prec", "Precision (avoid assumptions)", "Append: 'Be precise and avoid making assumptions.'"),
+    ("aug_truth", "Do not lie / admit uncertainty", "Append: 'Do not tell information you do not know...'"),
+    ("aug_transp", "Transparency", "Append: 'Clearly state any limitations or areas of uncertainty'"),
+    ("aug_json", "JSON output format", "Append: format result as JSON object"),
+    ("aug_cite", "Cite sources w/ links", "Append: cite sources + 1-line justification"),
+    ("aug_ask", "Ask clarifying Qs first", "Append: ask clarifying questions first"),
+    ("aug_assume", "List assumptions", "Append: list any assumptions"),
+    ("aug_edge", "Edge cases", "Append: consider edge cases"),
+    ("aug_examples", "Provide examples", "Append: include at least two examples"),
+    ("aug_outline", "Outline then answer", "Append: outline first, then full answer"),
+    ("aug_alts", "Alternatives & trade-offs", "Append: propose alternatives & compare"),
+    ("aug_time", "Time awareness", "Append: state current date/timezone assumptions"),
+    ("aug_rubric", "Rubric self-eval", "Append: evaluate your answer with a rubric"),
+    ("aug_actions", "Actionable next steps", "Append: numbered next actions"),
+    ("aug_constraints", "Constraints & non-goals first", "Append: list constraints and non-goals"),
+    ("aug_glossary", "Definitions glossary", "Append: short glossary of key terms"),
+    ("aug_test", "Test/validation plan", "Append: lightweight test/validation plan"),
 ]
 
 TONE_STYLE = [
-    ("tone_bullets", "Concise bullet points", tone_concise_bullets, "Append: answer using bullets"),
-    ("tone_friendly", "Friendly tone", tone_friendly, "Append: friendly, supportive tone"),
-    ("tone_acad", "Academic tone", tone_academic, "Append: formal, academic tone"),
-    ("tone_prof", "Professional tone", tone_professional, "Append: neutral, professional tone"),
-    ("tone_steps", "Numbered steps", tone_numbered_steps, "Append: organize as numbered steps"),
-    ("tone_conf", "Confident tone", tone_confident, "Append: confident, assertive tone"),
+    ("tone_bullets", "Concise bullet points", "Append: answer using bullets"),
+    ("tone_friendly", "Friendly tone", "Append: friendly, supportive tone"),
+    ("tone_acad", "Academic tone", "Append: formal, academic tone"),
+    ("tone_prof", "Professional tone", "Append: neutral, professional tone"),
+    ("tone_steps", "Numbered steps", "Append: organize as numbered steps"),
+    ("tone_conf", "Confident tone", "Append: confident, assertive tone"),
 ]
 
 OUTPUT_STRUCT = [
-    ("out_tldr", "TL;DR first", tldr_first, "Append: brief TL;DR before details"),
-    ("out_table", "Markdown table", markdown_table, "Append: include a summary table"),
-    ("out_headers", "Section headers", section_headers, "Append: headers structure"),
-    ("out_faq", "FAQ section", faq_section, "Append: close with a short FAQ"),
-    ("out_star", "STAR format", star_format, "Append: STAR structure"),
-    ("out_mece", "MECE structure", mece_structure, "Append: MECE organization"),
+    ("out_tldr", "TL;DR first", "Append: brief TL;DR before details"),
+    ("out_table", "Markdown table", "Append: include a summary table"),
+    ("out_headers", "Section headers", "Append: headers structure"),
+    ("out_faq", "FAQ section", "Append: close with a short FAQ"),
+    ("out_star", "STAR format", "Append: STAR structure"),
+    ("out_mece", "MECE structure", "Append: MECE organization"),
 ]
 
 SAFETY_QA = [
-    ("qa_bias", "Bias check", bias_check, "Append: identify potential biases"),
-    ("qa_risks", "Risk register", risk_register, "Append: key risks + mitigations"),
-    ("qa_sec", "Security considerations", security_considerations, "Append: security & safe use notes"),
-    ("qa_license", "License note", license_note, "Append: mention licenses if known"),
+    ("qa_bias", "Bias check", "Append: identify potential biases"),
+    ("qa_risks", "Risk register", "Append: key risks + mitigations"),
+    ("qa_sec", "Security considerations", "Append: security & safe use notes"),
+    ("qa_license", "License note", "Append: mention licenses if known"),
 ]
 
 CODE_DATA = [
-    ("code_run", "Runnable code snippet", runnable_code_snippet, "Append: minimal runnable code with comments"),
-    ("code_pseudo", "Pseudocode first", pseudocode_first, "Append: give pseudocode before code"),
-    ("code_complex", "Complexity analysis", complexity_analysis, "Append: time/space complexity"),
-    ("code_tests", "Unit tests", unit_tests, "Append: simple unit tests or cases"),
-    ("code_schema", "Data schema", data_schema, "Append: minimal schema & field descriptions"),
+    ("code_run", "Runnable code snippet", "Append: minimal runnable code with comments"),
+    ("code_pseudo", "Pseudocode first", "Append: give pseudocode before code"),
+    ("code_complex", "Complexity analysis", "Append: time/space complexity"),
+    ("code_tests", "Unit tests", "Append: simple unit tests or cases"),
+    ("code_schema", "Data schema", "Append: minimal schema & field descriptions"),
 ]
 
 
+@dataclass
+class Option:
+    __slots__ = ("key", "label", "tip", "checkbox")
+    key: str
+    label: str
+    tip: str
+    checkbox: QCheckBox
+
+
 # ------------------------------------------------------------
 # Utilities: persistence of popularity & recents
 # ------------------------------------------------------------
 
 STATE_PATH = os.path.join(str(Path.home()), ".prompt_builder_state.json")
-DEFAULT_STATE = {"popular": {}, "recent": [], "favorites": []}  # recent is list of lists of keys
+_STATE_TMP = STATE_PATH + ".tmp"
+DEFAULT_STATE = {"popular": {}, "recent": [], "favorites": []}  # recent is a flat list of keys, oldest first
 
 def load_state():
+    p = Path(STATE_PATH)
+    if not p.is_file():  # first run: nothing to parse
+        return DEFAULT_STATE.copy()
     try:
-        with open(STATE_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return json.loads(p.read_bytes())
     except Exception:
         return DEFAULT_STATE.copy()
 
 def save_state(state):
     try:
-        with open(STATE_PATH, "w", encoding="utf-8") as f:
-            json.dump(state, f, indent=2)
+        with open(_STATE_TMP, "w", encoding="utf-8") as f:
+            json.dump(state, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(_STATE_TMP, STATE_PATH)
     except Exception:
         pass
 
 
+# ------------------------------------------------------------
+# Stylesheet: layout/shape rules always apply, colors only in dark theme
+# ------------------------------------------------------------
+
+_STYLESHEET = """
+QGroupBox {
+    font-weight: 600;
+    border: 1px solid palette(mid);
+    border-radius: 10px;
+    margin-top: 10px;
+    padding: 10px 10px 8px 10px;
+}
+QGroupBox::title {
+    subcontrol-origin: margin;
+    left: 12px;
+    padding: 0px 4px 0px 4px;
+}
+QTextEdit, QLineEdit, QComboBox {
+    border: 1px solid palette(mid);
+    border-radius: 8px;
+    padding: 8px;
+    font-size: 14px;
+}
+QPushButton {
+    border: 1px solid palette(mid);
+    border-radius: 10px;
+    padding: 7px 12px;
+}
+QPushButton:checked {
+    background: #3b82f6;
+    border-color: #3b82f6;
+    color: white;
+}
+QCheckBox { spacing: 8px; }
+
+QMainWindow[theme="dark"] QGroupBox { border-color: #2a2e35; }
+QMainWindow[theme="dark"] QGroupBox::title { color: #e8eaed; }
+QMainWindow[theme="dark"] QTextEdit, QMainWindow[theme="dark"] QLineEdit, QMainWindow[theme="dark"] QComboBox {
+    border-color: #30343a;
+    background: #1f2227;
+    color: #e8eaed;
+}
+QMainWindow[theme="dark"] QPushButton {
+    border-color: #30343a;
+    background: #2a2e35;
+    color: #e8eaed;
+}
+QMainWindow[theme="dark"] QPushButton:hover { border-color: #4b5563; }
+QMainWindow[theme="dark"] QPushButton:checked {
+    background: #3b82f6;
+    border-color: #3b82f6;
+    color: white;
+}
+QMainWindow[theme="dark"] QCheckBox { color: #e8eaed; }
+QMainWindow[theme="dark"] QStatusBar { color: #cbd5e1; }
+QMainWindow[theme="dark"] QMenuBar { background: #1f2227; color: #e8eaed; }
+QMainWindow[theme="dark"] QMenu { background: #1f2227; color: #e8eaed; border: 1px solid #30343a; }
+"""
+
+
 # ------------------------------------------------------------
 # Main window
 # ------------------------------------------------------------
@@ -361,14 +307,35 @@ class PromptBuilder(QMainWindow):
         self.setMinimumSize(1200, 760)
         self.setWindowIcon(QIcon())
 
-        # Registry: key -> (checkbox, func, label)
+        # Registry: key -> checkbox / label
         self.key_to_checkbox = {}
-        self.key_to_func = {}
         self.key_to_label = {}
-        self.key_to_chips = {}  # key -> list[QPushButton] mirrors for chip buttons
+        self._selected_keys: set[str] = set()
+        self._search_index: list[tuple[QCheckBox, str]] = []  # (checkbox, casefolded label + tooltip)
+        self._button_groups: list[QButtonGroup] = []
+        self._last_filter = ""
 
         # Load persisted state
         self.state = load_state()
+        self._recent = self._load_recent(self.state.get("recent", []))
+
+        # State writes are batched: mark dirty, flush once things go quiet
+        self._state_dirty = False
+        self._state_flush_timer = QTimer(self)
+        self._state_flush_timer.setSingleShot(True)
+        self._state_flush_timer.setInterval(500)
+        self._state_flush_timer.timeout.connect(self._flush_state)
+
+        # Coalesce bursts into one preview rebuild: 120 ms for typing, next loop turn for toggles
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.timeout.connect(self._do_update_preview)
+
+        # Last composed prompt, keyed by (base hash, selected keys)
+        self._cache_key = None
+        self._cache_value = ""
+        self._last_preview_text = None
+        self._base_text = ""  # snapshot of base_edit, taken once per preview refresh
 
         # Central layout
         root = QHBoxLayout()
@@ -390,7 +357,11 @@ class PromptBuilder(QMainWindow):
         top_row = QHBoxLayout()
         self.search_edit = QLineEdit()
         self.search_edit.setPlaceholderText("Search options… (filters all lists)")
-        self.search_edit.textChanged.connect(self.apply_filter)
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(100)
+        self._filter_timer.timeout.connect(lambda: self.apply_filter(self.search_edit.text()))
+        self.search_edit.textChanged.connect(self._filter_timer.start)
         top_row.addWidget(self.search_edit, 1)
 
         self.preset_box = QComboBox()
@@ -417,6 +388,11 @@ class PromptBuilder(QMainWindow):
         self.popular_layout = QGridLayout(self.popular_group)
         controls_col.addWidget(self.popular_group)
 
+        # Chip buttons are pooled and relabelled on refresh rather than recreated
+        self._recent_chips = self._make_chip_pool(self.recent_layout)
+        self._popular_chips = self._make_chip_pool(self.popular_layout)
+        self._chips_by_key: dict[str, list[QPushButton]] = {}
+
         # Base prompt
         base_group = QGroupBox("Base Prompt")
         base_layout = QVBoxLayout(base_group)
@@ -495,15 +471,20 @@ class PromptBuilder(QMainWindow):
         right.addWidget(tip)
 
         self.setStatusBar(QStatusBar())
+        # Both palettes are built once; theme toggles just swap them in
+        self._dark_palette = self._build_dark_palette()
+        self._light_palette = QApplication.style().standardPalette()
+        self.setProperty("theme", "dark")
         self.apply_dark_theme()  # default to dark
-        self.update_preview()
+        self._do_update_preview()
+        self._seed_popular_topn()
         self.refresh_quick_chips()
 
         # Menu (small conveniences)
         self._build_menu()
 
-        # Styling
-        self.setStyleSheet(self._base_stylesheet())
+        # Styling (parsed once; theme colors are switched via the "theme" property)
+        self.setStyleSheet(_STYLESHEET)
 
     # -------------------------------
     # UI Construction helpers
@@ -526,66 +507,29 @@ class PromptBuilder(QMainWindow):
     def _make_group(self, title, items, store_list, cols=2) -> QGroupBox:
         group = QGroupBox(title)
         grid = QGridLayout(group)
-        for i, (key, label, func, tip) in enumerate(items):
+        # One non-exclusive button group per section -> one connection instead of one per checkbox
+        bg = QButtonGroup(group)
+        bg.setExclusive(False)
+        bg.buttonToggled.connect(self._on_button_toggled)
+        self._button_groups.append(bg)
+        opts = []
+        for i, (key, label, tip) in enumerate(items):
             cb = QCheckBox(label)
             cb.setToolTip(tip)
-            cb.stateChanged.connect(self.update_preview)
-            store_list.append((cb, func, key, label))
+            cb.setProperty("pb_key", key)
+            bg.addButton(cb, i)
+            self._search_index.append((cb, f"{label} {tip}".casefold()))
+            opts.append(Option(key, label, tip, cb))
             self.key_to_checkbox[key] = cb
-            self.key_to_func[key] = func
             self.key_to_label[key] = label
             row = i // cols
             col = i % cols
             grid.addWidget(cb, row, col)
+        store_list.extend(opts)
         return group
 
-    def _base_stylesheet(self) -> str:
-        # Subtle, modern dark UI with pill buttons ("chips")
-        return """
-        QGroupBox {
-            font-weight: 600;
-            border: 1px solid #2a2e35;
-            border-radius: 10px;
-            margin-top: 10px;
-            padding: 10px 10px 8px 10px;
-        }
-        QGroupBox::title {
-            subcontrol-origin: margin;
-            left: 12px;
-            padding: 0px 4px 0px 4px;
-            color: #e8eaed;
-        }
-        QTextEdit, QLineEdit, QComboBox {
-            border: 1px solid #30343a;
-            border-radius: 8px;
-            padding: 8px;
-            font-size: 14px;
-            background: #1f2227;
-            color: #e8eaed;
-        }
-        QPushButton {
-            border: 1px solid #30343a;
-            border-radius: 10px;
-            padding: 7px 12px;
-            background: #2a2e35;
-            color: #e8eaed;
-        }
-        QPushButton:hover { border-color: #4b5563; }
-        QPushButton:checked {
-            background: #3b82f6;
-            border-color: #3b82f6;
-            color: white;
-        }
-        QCheckBox {
-            color: #e8eaed;
-            spacing: 8px;
-        }
-        QStatusBar { color: #cbd5e1; }
-        QMenuBar { background: #1f2227; color: #e8eaed; }
-        QMenu { background: #1f2227; color: #e8eaed; border: 1px solid #30343a; }
-        """
-
-    def apply_dark_theme(self):
+    @staticmethod
+    def _build_dark_palette() -> QPalette:
         pal = QPalette()
         pal.setColor(QPalette.ColorRole.Window, QColor("#15181c"))
         pal.setColor(QPalette.ColorRole.WindowText, QColor("#e8eaed"))
@@ -599,12 +543,26 @@ class PromptBuilder(QMainWindow):
         pal.setColor(QPalette.ColorRole.BrightText, QColor("#ffffff"))
         pal.setColor(QPalette.ColorRole.Highlight, QColor("#3b82f6"))
         pal.setColor(QPalette.ColorRole.HighlightedText, QColor("#ffffff"))
-        QApplication.instance().setPalette(pal)
+        return pal
+
+    def _set_theme_property(self, theme: str):
+        if self.property("theme") == theme:
+            return
+        self.setProperty("theme", theme)
+        # Only a repolish is needed for the [theme=...] rules, not a stylesheet re-parse
+        for w in (self, *self.findChildren(QWidget)):
+            w.style().unpolish(w)
+            w.style().polish(w)
+
+    def apply_dark_theme(self):
+        QApplication.instance().setPalette(self._dark_palette)
+        self._set_theme_property("dark")
         self.theme_toggle.setChecked(True)
         self.theme_toggle.setText("Light Theme")
 
     def apply_light_theme(self):
-        QApplication.instance().setPalette(QApplication.style().standardPalette())
+        QApplication.instance().setPalette(self._light_palette)
+        self._set_theme_property("light")
         self.theme_toggle.setChecked(False)
         self.theme_toggle.setText("Dark Theme")
 
@@ -618,118 +576,142 @@ class PromptBuilder(QMainWindow):
     # Build final prompt
     # -------------------------------
     def build_prompt(self) -> str:
-        base = self.base_edit.toPlainText()
-
-        def ensure_space(s: str) -> str:
-            return (s.rstrip() + " ") if s and not s.endswith((" ", "\n")) else s
-
-        s = base
-
-        # Prepend groups in order: Roles -> Audience
-        for cb, func, key, _ in self.roles_checks:
-            if cb.isChecked():
-                s = func(s)
-        for cb, func, key, _ in self.audience_checks:
-            if cb.isChecked():
-                s = func(s)
-
-        # Append groups in order: Augment -> Tone -> Output -> Safety -> Code
-        for group in (self.aug_checks, self.tone_checks, self.output_checks,
-                      self.safety_checks, self.code_checks):
-            for cb, func, key, _ in group:
-                if cb.isChecked():
-                    s = ensure_space(s)
-                    s = func(s)
+        base = self._base_text
+        if not self._selected_keys:  # common case while typing: nothing to splice in
+            return base.strip()
+        key = (hash(base), frozenset(self._selected_keys))
+        if key != self._cache_key:
+            self._cache_value = self._compose_prompt(base)
+            self._cache_key = key
+        return self._cache_value
+
+    def _compose_prompt(self, base: str) -> str:
+        sel = self._selected_keys
+        # Prepend groups in order: Roles -> Audience; each one lands in front of the previous
+        # (the expert role has always been followed by two spaces)
+        parts = [text + ("  " if key == "role_expert" else " ")
+                 for key, text in PREPEND_SNIPPETS.items() if key in sel]
+        parts.reverse()
+        parts.append(base)
+
+        # Append groups in order: Augment -> Tone -> Output -> Safety -> Code;
+        # a space is only inserted when the text so far doesn't already end in one or a newline
+        s = "".join(parts)
+        for key, text in APPEND_SNIPPETS.items():
+            if key in sel:
+                if s and not s.endswith((" ", "\n")):
+                    s = s.rstrip() + " "
+                s += text
 
         return s.strip()
 
     # -------------------------------
     # Quick chips (Recent/Popular)
     # -------------------------------
-    def refresh_quick_chips(self):
-        # Clear layouts
-        def clear_layout(layout: QGridLayout):
-            while layout.count():
-                item = layout.takeAt(0)
-                w = item.widget()
-                if w:
-                    w.deleteLater()
-
-        clear_layout(self.recent_layout)
-        clear_layout(self.popular_layout)
-
-        recent_keys = self._compute_recent_keys(limit=10)
-        popular_keys = self._compute_popular_keys(limit=10)
+    def _make_chip_pool(self, layout: QGridLayout, size=10) -> list[QPushButton]:
+        pool = []
+        for i in range(size):
+            btn = QPushButton()
+            btn.setCheckable(True)
+            btn.hide()
+            btn.clicked.connect(self._on_chip_clicked)
+            layout.addWidget(btn, i // 3, i % 3)
+            pool.append(btn)
+        return pool
 
-        self._add_chip_row(self.recent_layout, recent_keys)
-        self._add_chip_row(self.popular_layout, popular_keys)
+    def refresh_quick_chips(self):
+        recent_keys = self._compute_recent_keys(limit=len(self._recent_chips))
+        popular_keys = self._compute_popular_keys(limit=len(self._popular_chips))
+
+        self._fill_chips(self._recent_chips, recent_keys)
+        self._fill_chips(self._popular_chips, popular_keys)
+
+        # key -> visible chips showing it, for O(1) sync on toggle
+        self._chips_by_key = {}
+        for btn in self._recent_chips + self._popular_chips:
+            key = btn.property("key")
+            if key:
+                self._chips_by_key.setdefault(key, []).append(btn)
+
+    @staticmethod
+    def _load_recent(entries) -> OrderedDict:
+        # Older state files stored one list of keys per use; flatten them oldest->newest
+        recent = OrderedDict()
+        for entry in entries:
+            for k in (entry if isinstance(entry, list) else (entry,)):
+                recent.pop(k, None)
+                recent[k] = None
+        return recent
 
     def _compute_recent_keys(self, limit=10):
-        # Flatten recent lists newest->oldest, keep unique
-        seen = set()
-        result = []
-        for key_list in reversed(self.state.get("recent", [])):
-            for k in key_list:
-                if k in self.key_to_checkbox and k not in seen:
-                    seen.add(k)
-                    result.append(k)
-                    if len(result) >= limit:
-                        return result
-        return result
+        # Newest first; the OrderedDict already holds each key once
+        return list(islice((k for k in reversed(self._recent) if k in self.key_to_checkbox), limit))
 
-    def _compute_popular_keys(self, limit=10):
+    def _seed_popular_topn(self, size=10):
+        # Min-heap of (count, key) holding the current top-N; kept up to date by record_usage
         pop = self.state.get("popular", {})
-        sorted_keys = sorted(
-            [k for k in pop if k in self.key_to_checkbox],
-            key=lambda k: pop.get(k, 0),
-            reverse=True
-        )
-        return sorted_keys[:limit]
+        self._popular_topn = heapq.nlargest(size, ((n, k) for k, n in pop.items() if k in self.key_to_checkbox))
+        heapq.heapify(self._popular_topn)
+        self._popular_size = size
+
+    def _bump_popular(self, key: str, count: int):
+        heap = self._popular_topn
+        for i, (_, k) in enumerate(heap):
+            if k == key:
+                heap[i] = (count, key)
+                heapq.heapify(heap)
+                return
+        if len(heap) < self._popular_size:
+            heapq.heappush(heap, (count, key))
+        elif (count, key) > heap[0]:
+            heapq.heapreplace(heap, (count, key))
 
-    def _add_chip_row(self, layout: QGridLayout, keys: list[str]):
-        self.key_to_chips.setdefault("__all__", [])
-        for i, key in enumerate(keys):
-            label = self.key_to_label.get(key, key)
-            btn = QPushButton(label)
-            btn.setCheckable(True)
-            btn.setChecked(self.key_to_checkbox[key].isChecked())
-            btn.clicked.connect(lambda checked, kk=key: self._chip_clicked(kk, checked))
-            # Track chips to keep them synced when underlying checkbox toggles elsewhere
-            self.key_to_chips.setdefault(key, []).append(btn)
-            row = i // 3
-            col = i % 3
-            layout.addWidget(btn, row, col)
-
-        # Keep chips synced with checkbox state
-        for key in keys:
-            cb = self.key_to_checkbox[key]
-            cb.stateChanged.connect(lambda _state, kk=key: self._sync_chips(kk))
-
-    def _chip_clicked(self, key: str, checked: bool):
-        cb = self.key_to_checkbox.get(key)
+    def _compute_popular_keys(self, limit=10):
+        return [k for _, k in sorted(self._popular_topn, reverse=True)[:limit]]
+
+    def _fill_chips(self, pool: list[QPushButton], keys: list[str]):
+        for i, btn in enumerate(pool):
+            if i < len(keys):
+                key = keys[i]
+                btn.setProperty("key", key)
+                btn.setText(self.key_to_label.get(key, key))
+                btn.setChecked(key in self._selected_keys)
+                btn.setVisible(True)
+            else:
+                btn.setProperty("key", None)
+                btn.setVisible(False)
+
+    def _on_button_toggled(self, btn, checked: bool):
+        self._on_option_toggled(btn.property("pb_key"), checked)
+
+    def _on_option_toggled(self, key: str, checked: bool):
+        if checked:
+            self._selected_keys.add(key)
+        else:
+            self._selected_keys.discard(key)
+        self._sync_chips(key)
+        self._preview_timer.start(0)
+
+    def _on_chip_clicked(self, checked: bool):
+        cb = self.key_to_checkbox.get(self.sender().property("key"))
         if cb:
             cb.setChecked(checked)
 
     def _sync_chips(self, key: str):
-        for btn in self.key_to_chips.get(key, []):
-            btn.setChecked(self.key_to_checkbox[key].isChecked())
+        checked = key in self._selected_keys
+        for btn in self._chips_by_key.get(key, ()):
+            btn.setChecked(checked)
 
     # -------------------------------
     # Search / filter
     # -------------------------------
     def apply_filter(self, text: str):
-        t = text.strip().lower()
-        def filt(cb: QCheckBox, label: str):
-            if not t:
-                cb.setVisible(True)
-                return
-            cb.setVisible(t in label.lower())
-
-        for cb, func, key, label in (
-            self.roles_checks + self.audience_checks + self.aug_checks +
-            self.tone_checks + self.output_checks + self.safety_checks + self.code_checks
-        ):
-            filt(cb, label)
+        t = text.strip().casefold()
+        if t == self._last_filter:  # e.g. whitespace-only edits
+            return
+        self._last_filter = t
+        for cb, hay in self._search_index:
+            cb.setVisible(not t or t in hay)
 
     # -------------------------------
     # Presets
@@ -759,36 +741,67 @@ class PromptBuilder(QMainWindow):
             ],
         }
         if name in presets:
-            self.clear_all()
-            for key in presets[name]:
-                if key in self.key_to_checkbox:
-                    self.key_to_checkbox[key].setChecked(True)
+            self._set_selection(presets[name])
             self.statusBar().showMessage(f"Applied preset: {name}", 3000)
 
     # -------------------------------
     # Actions
     # -------------------------------
     def update_preview(self):
-        self.preview.setPlainText(self.build_prompt())
+        self._preview_timer.start(120)
+
+    def _do_update_preview(self):
+        self._preview_timer.stop()
+        self._base_text = self.base_edit.toPlainText()
+        text = self.build_prompt()
+        if text == self._last_preview_text:
+            return
+        self.preview.setUpdatesEnabled(False)
+        try:
+            self.preview.setPlainText(text)
+        finally:
+            self.preview.setUpdatesEnabled(True)
+        self._last_preview_text = text
+
+    def _set_selection(self, keys):
+        # Bulk update with signals blocked, then sync chips/preview once.
+        # QButtonGroup.buttonToggled is emitted by the group itself, so block the groups too.
+        sel = set(keys) & self.key_to_checkbox.keys()
+        for bg in self._button_groups:
+            bg.blockSignals(True)
+        try:
+            for key, cb in self.key_to_checkbox.items():
+                cb.blockSignals(True)
+                cb.setChecked(key in sel)
+                cb.blockSignals(False)
+        finally:
+            for bg in self._button_groups:
+                bg.blockSignals(False)
+        self._selected_keys = sel
+        for key, chips in self._chips_by_key.items():
+            for btn in chips:
+                btn.setChecked(key in sel)
+        self._do_update_preview()
 
     def select_all(self):
-        for cb, *_ in (self.roles_checks + self.audience_checks + self.aug_checks +
-                       self.tone_checks + self.output_checks + self.safety_checks + self.code_checks):
-            cb.setChecked(True)
+        self._set_selection(self.key_to_checkbox)
 
     def clear_all(self):
-        for cb, *_ in (self.roles_checks + self.audience_checks + self.aug_checks +
-                       self.tone_checks + self.output_checks + self.safety_checks + self.code_checks):
-            cb.setChecked(False)
+        self._set_selection(())
+
+    def _current_prompt(self) -> str:
+        # Flush any pending edit, then reuse what the preview shows
+        self._do_update_preview()
+        return self._last_preview_text
 
     def copy_to_clipboard_and_record(self):
-        final = self.build_prompt()
+        final = self._current_prompt()
         QApplication.clipboard().setText(final)
         self.statusBar().showMessage("Prompt copied to clipboard.", 3000)
         self.record_usage()
 
     def save_to_file_and_record(self):
-        final = self.build_prompt()
+        final = self._current_prompt()
         if not final:
             QMessageBox.information(self, "Nothing to save", "The composed prompt is empty.")
             return
@@ -809,26 +822,41 @@ class PromptBuilder(QMainWindow):
         checked_keys = []
         for group in (self.roles_checks, self.audience_checks, self.aug_checks,
                       self.tone_checks, self.output_checks, self.safety_checks, self.code_checks):
-            for cb, func, key, _ in group:
-                if cb.isChecked():
-                    checked_keys.append(key)
+            checked_keys.extend(opt.key for opt in group if opt.key in self._selected_keys)
 
         # Update popularity counts
         pop = self.state.setdefault("popular", {})
         for k in checked_keys:
             pop[k] = pop.get(k, 0) + 1
+            self._bump_popular(k, pop[k])
 
-        # Update recent (cap to last 25 sessions)
-        rec = self.state.setdefault("recent", [])
-        if checked_keys:
-            rec.append(checked_keys)
-            if len(rec) > 25:
-                del rec[0]
+        # Update recent (move-to-end, cap to 50 keys)
+        rec = self._recent
+        for k in checked_keys:
+            rec.pop(k, None)
+            rec[k] = None
+        while len(rec) > 50:
+            rec.popitem(last=False)
+        self.state["recent"] = list(rec)
 
-        save_state(self.state)
+        self._mark_state_dirty()
         self.refresh_quick_chips()
         self.statusBar().showMessage("Usage recorded (Recent & Popular updated).", 3000)
 
+    def _mark_state_dirty(self):
+        self._state_dirty = True
+        self._state_flush_timer.start()
+
+    def _flush_state(self):
+        self._state_flush_timer.stop()
+        if self._state_dirty:
+            self._state_dirty = False
+            save_state(self.state)
+
+    def closeEvent(self, event):
+        self._flush_state()
+        super().closeEvent(event)
+
 
 # ------------------------------------------------------------
 # App bootstrap
@@ -13,7 +13,8 @@
 
 import os, sys, math, random
 from dataclasses import dataclass, field
-from typing import List, Tuple
+from typing import Callable, Dict, List, Optional
+import numpy as np
 from PyQt6 import QtCore, QtGui, QtWidgets
 from PyQt6.QtCore import Qt
 
@@ -39,6 +40,9 @@ class OverlayState:
     matrix_density: int = 36
     matrix_alpha: int = 130
 
+NOISE_TILE = 512  # side of the pre-generated grain tile
+BLIP_LUT = 4096   # pre-rolled Sci-Fi blip positions (power of two)
+
 # -------------------- Overlay per monitor --------------------
 
 class Overlay(QtWidgets.QWidget):
@@ -50,14 +54,34 @@ class Overlay(QtWidgets.QWidget):
         self.setWindowState(Qt.WindowState.WindowFullScreen)
         self.setGeometry(screen.geometry())
         self._make_clickthrough()
-        self.timer = QtCore.QTimer(self, interval=self.state.interval_ms, timeout=self.update)
-        self.timer.start()
+        self.timer = QtCore.QTimer(self, interval=self.state.interval_ms, timeout=self._tick)
         self.phase = 0.0
         self._seed = random.randint(0, 10**9)
         self._rng = random.Random(self._seed)
-        # matrix columns (x, y, speed)
-        self._matrix_cols: List[Tuple[int, float, float]] = []
+        # grain is one random tile blitted at a random offset each frame
+        self._rng_np = np.random.default_rng(self._seed)
+        raw = self._rng_np.bytes(NOISE_TILE * NOISE_TILE)  # QImage below wraps these bytes without copying
+        noise = QtGui.QImage(raw, NOISE_TILE, NOISE_TILE, NOISE_TILE, QtGui.QImage.Format.Format_Grayscale8)
+        # fromImage copies into the pixmap right away, so raw only has to outlive this call
+        self._noise_tile = QtGui.QPixmap.fromImage(noise)
+        # blip ring buffer: unit direction + radius fraction, indexed by phase
+        ang = self._rng_np.uniform(0, math.tau, BLIP_LUT)
+        self._blip_cos = np.cos(ang).tolist()
+        self._blip_sin = np.sin(ang).tolist()
+        self._blip_r01 = self._rng_np.random(BLIP_LUT).tolist()
+        # static pattern tiles (scanlines, CRT mask, grid cell), keyed by their parameters
+        self._layer_cache: Dict[tuple, QtGui.QPixmap] = {}
+        # gear outlines at the origin, keyed by (r, teeth, inner); rotation happens on the painter
+        self._gear_cache: Dict[tuple, QtGui.QPainterPath] = {}
+        # matrix columns as parallel arrays: x, head y, speed
+        self._rng_matrix = np.random.default_rng(self._seed ^ 0xA5A5)
+        self._mx_x = np.empty(0, np.int32)
+        self._mx_y = np.empty(0, np.float32)
+        self._mx_spd = np.empty(0, np.float32)
+        # area that changes frame to frame for the current preset (None = whole window)
+        self._motion_region: Optional[QtGui.QRegion] = None
         self._build_matrix()
+        self.update_animation()
 
     def _make_clickthrough(self):
         import ctypes
@@ -73,19 +97,63 @@ class Overlay(QtWidgets.QWidget):
 
     def set_preset(self, name: str):
         self.state.preset = name
-        self._build_matrix()  # refresh pattern if needed
+        self._build_matrix()  # refresh pattern if needed (also refreshes the motion region)
+        self.update_animation()
+
+    def update_animation(self):
+        # grain and rain move on their own; everything else only moves with phase (speed > 0)
+        st = self.state
+        animated = st.preset in ("Filmic", "Matrix Rain") or (st.speed > 0 and st.preset != "CRT Retro")
+        if animated and not self.timer.isActive():
+            self.timer.start()
+        elif not animated and self.timer.isActive():
+            self.timer.stop()
+            self.update()  # one final frame
+
+    def resizeEvent(self, ev):
+        super().resizeEvent(ev)
+        self._update_motion_region()
+
+    def _update_motion_region(self):
+        W, H = self.width(), self.height()
+        preset = self.state.preset
+        if preset == "CRT Retro":
+            # fully static; explicit update() calls still repaint everything
+            self._motion_region = QtGui.QRegion()
+        elif preset == "Sci-Fi HUD":
+            R = int(min(W, H) / 3) + 18  # outer ring + blip glow
+            self._motion_region = QtGui.QRegion(W//2 - R, H//2 - R, 2*R, 2*R)
+        elif preset == "Steampunk":
+            rgn = QtGui.QRegion()
+            for cx, cy, r, *_ in self._gear_specs(W, H):
+                rr = int(r) + 2
+                rgn = rgn.united(QtGui.QRegion(int(cx) - rr, int(cy) - rr, 2*rr, 2*rr))
+            self._motion_region = rgn
+        elif preset == "Matrix Rain":
+            rgn = QtGui.QRegion()
+            for x in self._mx_x.tolist():
+                rgn = rgn.united(QtGui.QRegion(x - 12, 0, 24, H))
+            self._motion_region = rgn
+        else:
+            self._motion_region = None  # noise / scrolling grid / strokes cover the screen
+
+    def _tick(self):
+        if self._motion_region is None:
+            self.update()
+        elif not self._motion_region.isEmpty():
+            self.update(self._motion_region)
 
     def _build_matrix(self):
         # prepare columns for Matrix preset
-        self._matrix_cols.clear()
         W = max(1, self.width())
         cols = max(4, self.state.matrix_density)
         step = max(8, W // cols)
-        rng = random.Random(self._seed ^ 0xA5A5)
-        for x in range(0, W, step):
-            speed = 0.15 + 0.65 * rng.random()
-            y0 = rng.uniform(0, self.height())
-            self._matrix_cols.append((x, y0, speed))
+        rng = self._rng_matrix
+        self._mx_x = np.arange(0, W, step, dtype=np.int32)
+        n = self._mx_x.size
+        self._mx_spd = 0.15 + 0.65 * rng.random(n, dtype=np.float32)
+        self._mx_y = rng.uniform(0, self.height(), n).astype(np.float32)
+        self._update_motion_region()
 
     # ----------- painting -----------
 
@@ -118,11 +186,9 @@ class Overlay(QtWidgets.QWidget):
     # ----------- layers -----------
 
     def _draw_noise(self, p: QtGui.QPainter, W: int, H: int, strength: float):
-        img = QtGui.QImage(W, H, QtGui.QImage.Format.Format_Grayscale8)
-        buf = img.bits(); buf.setsize(W * H)
-        import os; buf[:] = os.urandom(W * H)
         p.setOpacity(max(0.0, min(1.0, strength)))
-        p.drawImage(0, 0, img)
+        p.drawTiledPixmap(0, 0, W, H, self._noise_tile,
+                          self._rng.randrange(NOISE_TILE), self._rng.randrange(NOISE_TILE))
         p.setOpacity(1.0)
 
     def _draw_vignette(self, p: QtGui.QPainter, W: int, H: int, center_alpha: int, color=QtGui.QColor(255,255,255)):
@@ -134,19 +200,30 @@ class Overlay(QtWidgets.QWidget):
         p.fillRect(0, 0, W, H, QtGui.QBrush(grad))
         p.setCompositionMode(QtGui.QPainter.CompositionMode.CompositionMode_SourceOver)
 
+    def _tile(self, key: tuple, w: int, h: int, paint: Callable[[QtGui.QPainter], None]) -> QtGui.QPixmap:
+        pm = self._layer_cache.get(key)
+        if pm is None:
+            if len(self._layer_cache) > 32:  # opacity-driven alphas can mint many keys
+                self._layer_cache.clear()
+            pm = QtGui.QPixmap(w, h)
+            pm.fill(Qt.GlobalColor.transparent)
+            qp = QtGui.QPainter(pm)
+            paint(qp)
+            qp.end()
+            self._layer_cache[key] = pm
+        return pm
+
     def _draw_scanlines(self, p: QtGui.QPainter, W: int, H: int, alpha: int, step: int = 2):
-        pen = QtGui.QPen(QtGui.QColor(0, 0, 0, alpha))
-        p.setPen(pen)
-        y = 0
-        while y < H:
-            p.drawLine(0, y, W, y)
-            y += step
+        tile = self._tile(("scan", alpha, step), 64, step,
+                          lambda qp: qp.fillRect(0, 0, 64, 1, QtGui.QColor(0, 0, 0, alpha)))
+        p.drawTiledPixmap(0, 0, W, H, tile)
 
     def _draw_crt_mask(self, p: QtGui.QPainter, W: int, H: int, cell: int, alpha: int):
-        for x in range(0, W, cell * 3):
-            p.fillRect(x, 0, cell, H, QtGui.QColor(255, 0, 0, alpha))
-            p.fillRect(x + cell, 0, cell, H, QtGui.QColor(0, 255, 0, alpha))
-            p.fillRect(x + cell * 2, 0, cell, H, QtGui.QColor(0, 0, 255, alpha))
+        def paint(qp):
+            qp.fillRect(0, 0, cell, 64, QtGui.QColor(255, 0, 0, alpha))
+            qp.fillRect(cell, 0, cell, 64, QtGui.QColor(0, 255, 0, alpha))
+            qp.fillRect(cell * 2, 0, cell, 64, QtGui.QColor(0, 0, 255, alpha))
+        p.drawTiledPixmap(0, 0, W, H, self._tile(("crt", cell, alpha), cell * 3, 64, paint))
 
     # ----------- preset implementations -----------
 
@@ -185,17 +262,17 @@ class Overlay(QtWidgets.QWidget):
         # crosshair
         pen = QtGui.QPen(col, 1.5)
         p.setPen(pen)
-        p.drawLine(W/2 - 80, H/2, W/2 + 80, H/2)
-        p.drawLine(W/2, H/2 - 80, W/2, H/2 + 80)
+        p.drawLines(QtCore.QLineF(W/2 - 80, H/2, W/2 + 80, H/2),
+                    QtCore.QLineF(W/2, H/2 - 80, W/2, H/2 + 80))
 
         # blips
-        rng = self._rng
-        rng.seed(int(self.phase*1000) ^ self._seed)
-        for _ in range(8):
-            a = rng.uniform(0, math.tau)
-            r = rng.uniform(40, min(W, H)/3)
-            x = W/2 + math.cos(a)*r
-            y = H/2 + math.sin(a)*r
+        base = int(self.phase*1000)
+        R = min(W, H)/3
+        for i in range(8):
+            j = (base + i) & (BLIP_LUT - 1)
+            r = 40 + (R - 40) * self._blip_r01[j]
+            x = W/2 + self._blip_cos[j]*r
+            y = H/2 + self._blip_sin[j]*r
             g = QtGui.QRadialGradient(x, y, 16)
             cc = QtGui.QColor(col); cc.setAlpha(160)
             g.setColorAt(0.0, cc); cc2 = QtGui.QColor(col); cc2.setAlpha(0); g.setColorAt(1.0, cc2)
@@ -209,31 +286,44 @@ class Overlay(QtWidgets.QWidget):
         alpha = int(80 + 150 * self.state.opacity)
         col.setAlpha(alpha)
         p.setCompositionMode(QtGui.QPainter.CompositionMode.CompositionMode_Screen)
-        p.setPen(QtGui.QPen(col, 1.2))
         # scroll
         off = int(self.phase * 40) % 40
-        # vertical lines
+        # one grid cell (left + top edge), tiled; scrolling is just the source offset
         step = max(20, W // 32)
-        for x in range(-off, W+off, step):
-            p.drawLine(x, 0, x, H)
-        # horizontal lines
-        for y in range(-off, H+off, step):
-            p.drawLine(0, y, W, y)
+        def paint(qp):
+            qp.fillRect(0, 0, 1, step, col)
+            qp.fillRect(0, 0, step, 1, col)
+        tile = self._tile(("grid", step, col.rgba()), step, step, paint)
+        p.drawTiledPixmap(0, 0, W, H, tile, off % step, off % step)
         # subtle center bloom
         self._draw_vignette(p, W, H, center_alpha=20, color=self.state.accent)
         p.setCompositionMode(QtGui.QPainter.CompositionMode.CompositionMode_SourceOver)
 
-    def _gear_path(self, cx, cy, r, teeth=10, inner=0.65) -> QtGui.QPainterPath:
+    def _gear_path(self, r, teeth=10, inner=0.65) -> QtGui.QPainterPath:
+        key = (round(r, 2), teeth, inner)
+        path = self._gear_cache.get(key)
+        if path is not None:
+            return path
         path = QtGui.QPainterPath()
         for i in range(teeth*2):
             ang = (i / (teeth*2.0)) * math.tau
             rr = r if (i % 2 == 0) else r*inner
-            x, y = cx + rr*math.cos(ang), cy + rr*math.sin(ang)
+            x, y = rr*math.cos(ang), rr*math.sin(ang)
             if i == 0: path.moveTo(x, y)
             else: path.lineTo(x, y)
         path.closeSubpath()
+        self._gear_cache[key] = path
         return path
 
+    @staticmethod
+    def _gear_specs(W, H):
+        # (cx, cy, r, teeth, rpm)
+        return [
+            (W*0.25, H*0.3, min(W, H)*0.08, 12,  +80),
+            (W*0.55, H*0.55, min(W, H)*0.12, 10, -60),
+            (W*0.78, H*0.35, min(W, H)*0.07,  8, +100),
+        ]
+
     def _draw_steampunk(self, p, W, H):
         # brass tint + spinning gears + vignette
         p.save()
@@ -245,19 +335,11 @@ class Overlay(QtWidgets.QWidget):
         br = QtGui.QColor(220, 170, 90, 160)
         p.setBrush(br)
 
-        rng = self._rng
-        rng.seed(self._seed)
-        gears = [
-            (W*0.25, H*0.3, min(W, H)*0.08, 12,  +80),
-            (W*0.55, H*0.55, min(W, H)*0.12, 10, -60),
-            (W*0.78, H*0.35, min(W, H)*0.07,  8, +100),
-        ]
-        for cx, cy, r, teeth, rpm in gears:
-            path = self._gear_path(cx, cy, r, teeth=teeth, inner=0.68)
+        for cx, cy, r, teeth, rpm in self._gear_specs(W, H):
+            path = self._gear_path(r, teeth=teeth, inner=0.68)
             p.save()
             p.translate(cx, cy)
             p.rotate(self.phase * rpm * 360)
-            p.translate(-cx, -cy)
             p.drawPath(path)
             p.restore()
 
@@ -267,30 +349,30 @@ class Overlay(QtWidgets.QWidget):
 
     def _draw_vaporwave(self, p, W, H):
         # sunset stripes + diagonal neon strokes
+        # static backdrop (horizon gradient + sun stripes), rendered once per size
+        def paint(qp):
+            grad = QtGui.QLinearGradient(0, 0, 0, H)
+            grad.setColorAt(0.0, QtGui.QColor(255, 100, 150, 80))
+            grad.setColorAt(0.5, QtGui.QColor(255, 180, 80, 80))
+            grad.setColorAt(1.0, QtGui.QColor(60, 80, 170, 80))
+            qp.fillRect(0, 0, W, H, QtGui.QBrush(grad))
+            qp.setCompositionMode(QtGui.QPainter.CompositionMode.CompositionMode_Screen)
+            # sun stripes
+            sunR = min(W, H)/6
+            y0 = H*0.35
+            for i in range(16):
+                yy = y0 + (i - 8) * 6
+                alpha = max(0, 140 - i*10)
+                qp.fillRect(QtCore.QRectF(W/2 - sunR, yy, sunR*2, 3), QtGui.QColor(255, 180, 90, alpha))
         p.setCompositionMode(QtGui.QPainter.CompositionMode.CompositionMode_Screen)
-        # horizon gradient
-        grad = QtGui.QLinearGradient(0, 0, 0, H)
-        grad.setColorAt(0.0, QtGui.QColor(255, 100, 150, 80))
-        grad.setColorAt(0.5, QtGui.QColor(255, 180, 80, 80))
-        grad.setColorAt(1.0, QtGui.QColor(60, 80, 170, 80))
-        p.fillRect(0, 0, W, H, QtGui.QBrush(grad))
-
-        # sun stripes
-        sunR = min(W, H)/6
-        y0 = H*0.35
-        for i in range(16):
-            yy = y0 + (i - 8) * 6
-            alpha = max(0, 140 - i*10)
-            col = QtGui.QColor(255, 180, 90, alpha)
-            p.fillRect(W/2 - sunR, yy, sunR*2, 3, col)
+        p.drawPixmap(0, 0, self._tile(("vapor", W, H), W, H, paint))
 
         # diagonal strokes
         col = QtGui.QColor(self.state.accent); col.setAlpha(120)
         pen = QtGui.QPen(col, 2.0, Qt.PenStyle.SolidLine, Qt.PenCapStyle.RoundCap)
         p.setPen(pen)
         off = int(self.phase * 80) % 80
-        for y in range(-H, H, 40):
-            p.drawLine(-off, y, W-off, y+W*0.25)
+        p.drawLines(*[QtCore.QLineF(-off, y, W-off, y+W*0.25) for y in range(-H, H, 40)])
 
         p.setCompositionMode(QtGui.QPainter.CompositionMode.CompositionMode_SourceOver)
         self._draw_vignette(p, W, H, center_alpha=18)
@@ -300,16 +382,24 @@ class Overlay(QtWidgets.QWidget):
         p.setCompositionMode(QtGui.QPainter.CompositionMode.CompositionMode_Screen)
         base = QtGui.QColor(80, 255, 120, self.state.matrix_alpha)
         trail = QtGui.QColor(80, 255, 120, int(self.state.matrix_alpha*0.35))
-        for ix, (x, y, spd) in enumerate(self._matrix_cols):
-            # advance
-            y2 = (y + (self.state.speed + 1) * spd * 6) % (H + 60)
-            self._matrix_cols[ix] = (x, y2, spd)
-            # head glow
-            g = QtGui.QRadialGradient(x, y2, 10)
+        # advance all columns at once
+        self._mx_y += (self.state.speed + 1) * 6 * self._mx_spd
+        np.fmod(self._mx_y, H + 60, out=self._mx_y)
+        # head glow: one pre-rendered sprite blitted per column
+        def paint(qp):
+            g = QtGui.QRadialGradient(12, 12, 10)
             g.setColorAt(0.0, base); g.setColorAt(1.0, QtGui.QColor(base.red(), base.green(), base.blue(), 0))
-            p.fillRect(x-12, y2-12, 24, 24, QtGui.QBrush(g))
-            # short trail
-            p.fillRect(x-1, int(y2-18), 2, 18, trail)
+            qp.fillRect(0, 0, 24, 24, QtGui.QBrush(g))
+        head = self._tile(("mxhead", base.alpha()), 24, 24, paint)
+        trails = []
+        for x, y2 in zip(self._mx_x.tolist(), self._mx_y.tolist()):
+            p.drawPixmap(QtCore.QPointF(x-12, y2-12), head)
+            trails.append(QtCore.QRectF(x-1, int(y2-18), 2, 18))
+        # short trails, one batched call
+        if trails:
+            p.setPen(Qt.PenStyle.NoPen)
+            p.setBrush(trail)
+            p.drawRects(*trails)
         p.setCompositionMode(QtGui.QPainter.CompositionMode.CompositionMode_SourceOver)
 
 # -------------------- Controller GUI --------------------
@@ -319,6 +409,8 @@ class Studio(QtWidgets.QWidget):
         super().__init__()
         self.setWindowTitle("Overlay Studio — Retro, Sci-Fi, Steampunk, more")
         self.state = OverlayState()
+        # density spin/drag settles before the matrix columns are rebuilt
+        self._matrix_timer = QtCore.QTimer(self, singleShot=True, interval=30, timeout=self._rebuild_matrix)
         self._build_ui()
         # overlays per screen
         self.overlays: List[Overlay] = [Overlay(s, self.state) for s in app.screens()]
@@ -419,12 +511,20 @@ class Studio(QtWidgets.QWidget):
         self.state.interval_ms = self.interval.value()
         self.state.scan_alpha = self.crtAlpha.value()
         self.state.crt_cell = self.crtCell.value()
-        self.state.matrix_density = self.mxCols.value()
+        if self.state.matrix_density != self.mxCols.value():
+            self.state.matrix_density = self.mxCols.value()
+            self._matrix_timer.start()
         self.state.matrix_alpha = self.mxAlpha.value()
         for ov in self.overlays:
             ov.set_interval(self.state.interval_ms)
-            if self.state.preset == "Matrix Rain":
-                ov._build_matrix()
+            ov.update_animation()
+            ov.update()
+
+    def _rebuild_matrix(self):
+        if self.state.preset != "Matrix Rain":
+            return  # set_preset rebuilds on the way in
+        for ov in self.overlays:
+            ov._build_matrix()
             ov.update()
 
 # -------------------- main --------------------